@@ -1,16 +1,23 @@
 """
 API Routes for the Investment Research Assistant
 """
-from fastapi import APIRouter, HTTPException, Request
-from fastapi.responses import FileResponse
-from pydantic import BaseModel, Field
-from pydantic import field_validator
-from typing import List, Optional, Dict, Any
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse, ORJSONResponse
+from pydantic import BaseModel, Field, StringConstraints
+from typing import Annotated, List, Optional, Dict, Any
+from functools import lru_cache
+import asyncio
+import hashlib
 import logging
 import os
+import time
 from pathlib import Path
 
+import numpy as np
+import orjson
+
 from services.rag_service import RAGService
+from services.embedding_service import EmbeddingService
 from core.security import (
     validate_query, 
     QueryValidationResult, 
@@ -24,17 +31,42 @@ from core.cost_tracker import (
     add_cost,
     get_cost_summary
 )
-import uuid
+import secrets
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Initialize RAG service
-rag_service = RAGService()
+# Lazily constructed, process-wide service singletons. Constructing these
+# at import time would open connection pools (and hit Pinecone) before the
+# app is even serving, and doing it per-request would multiply that cost.
+@lru_cache(maxsize=1)
+def get_rag_service() -> RAGService:
+    """Return the shared RAGService instance for this worker process"""
+    return RAGService()
+
+
+@lru_cache(maxsize=1)
+def get_embedding_service() -> EmbeddingService:
+    """Return the shared EmbeddingService instance for this worker process"""
+    return EmbeddingService()
 
-# Document directory path
+
+# Document directory path, resolved once at import. Path construction plus
+# resolve() does real syscalls, so doing it per request is wasted work.
 DOCS_DIR = os.getenv("DOCS_DIR", os.path.join(os.path.dirname(__file__), "..", "..", "demo_data", "documents"))
+_DOCS_DIR: Path = Path(DOCS_DIR).resolve()
+
+# Cache for the /documents listing. The document inventory changes rarely,
+# so serving it from memory avoids an embedding call + a 500-result Pinecone
+# query on every GET.
+_DOCS_CACHE: Dict[str, Any] = {"data": None, "ts": 0.0, "etag": None}
+_DOCS_TTL = 300  # seconds
+
+# Cache headers for polled read endpoints: lets the browser/CDN reuse a
+# fresh reply (or revalidate via ETag -> 304) without touching Python
+_DOCS_CACHE_CONTROL = "public, max-age=60, stale-while-revalidate=300"
+_COSTS_CACHE_CONTROL = "public, max-age=10"
 
 
 
@@ -42,25 +74,12 @@ DOCS_DIR = os.getenv("DOCS_DIR", os.path.join(os.path.dirname(__file__), "..", "
 # Request/Response Models
 class QueryRequest(BaseModel):
     """Request model for research queries"""
-    query: str = Field(..., min_length=3, max_length=2000, description="User query (3-2000 characters)")
+    query: Annotated[
+        str,
+        StringConstraints(strip_whitespace=True, min_length=3, max_length=2000)
+    ] = Field(..., description="User query (3-2000 characters)")
     top_k: Optional[int] = Field(default=5, ge=1, le=20, description="Number of results (1-20)")
     use_reranking: Optional[bool] = Field(default=False, description="Use Cohere reranking to improve result quality")
-    
-    @field_validator('query')
-    @classmethod
-    def validate_query(cls, v):
-        """Validate and sanitize query"""
-        if not v or not isinstance(v, str):
-            raise ValueError("Query must be a non-empty string")
-        
-        # Trim and validate
-        v = v.strip()
-        if len(v) < 3:
-            raise ValueError("Query must be at least 3 characters long")
-        if len(v) > 2000:
-            raise ValueError("Query must be no more than 2000 characters")
-        
-        return v
 
 
 class Source(BaseModel):
@@ -80,6 +99,17 @@ class QueryResponse(BaseModel):
     query: str
 
 
+class BatchQueryRequest(BaseModel):
+    """Request model for batched research queries"""
+    queries: List[str] = Field(..., min_length=1, max_length=48, description="Queries to process (1-48)")
+    top_k: Optional[int] = Field(default=5, ge=1, le=20, description="Number of results per query (1-20)")
+
+
+class BatchQueryResponse(BaseModel):
+    """Response model for batched research queries"""
+    results: List[QueryResponse]
+
+
 class DocumentUploadResponse(BaseModel):
     """Response model for document uploads"""
     document_id: str
@@ -95,7 +125,7 @@ class DocumentInfo(BaseModel):
     file_size: Optional[int] = None
 
 
-@router.post("/query", response_model=QueryResponse)
+@router.post("/query", response_model=QueryResponse, response_class=ORJSONResponse)
 async def query_documents(request: QueryRequest, req: Request):
     """
     Query the research assistant with a question.
@@ -103,7 +133,8 @@ async def query_documents(request: QueryRequest, req: Request):
     
     Security: Rate limited (10/min), input validated, prompt injection protected, cost limited.
     """
-    request_id = str(uuid.uuid4())
+    # Cheaper than uuid4: one urandom read, no hyphen formatting
+    request_id = secrets.token_hex(16)
     
     try:
         # Check cost limit before processing
@@ -151,28 +182,39 @@ async def query_documents(request: QueryRequest, req: Request):
         # Use RAG service to get answer with sanitized query
         # Enable reranking if requested (default: False, but can be enabled via API)
         use_reranking = request.use_reranking if request.use_reranking is not None else False
-        
-        result = rag_service.query(
+
+        rag_service = get_rag_service()
+
+        # Native async pipeline: the OpenAI calls await on the shared async
+        # client and only the sync Pinecone SDK hops to a worker thread, so
+        # the multi-second LLM round trip doesn't pin a threadpool slot the
+        # way to_thread(rag_service.query) did. Response caching (exact +
+        # semantic layers) lives inside aquery, so cache hits return in one
+        # dict lookup here as well.
+        result = await rag_service.aquery(
             query=validation_result.sanitized_query,
             top_k=validated_top_k,
             use_reranking=use_reranking,
             query_analysis=analysis_result  # Pass analysis to improve prompts
         )
-        
+
+        cache_hit = result.get('cache_hit', False)
+
         # Log if reranking was used
         if result.get('reranked'):
             logger.info(f"Reranking applied for query: {validation_result.sanitized_query[:100]}...")
-        
-        # Track cost
-        cost_info = add_cost(
-            amount_usd=result.get('cost_usd', 0.0),
-            request_id=request_id,
-            source='rag_query'
-        )
-        
-        # Check if cost limit was exceeded after this request
-        if cost_info['limit_exceeded']:
-            logger.warning(f"Cost limit exceeded after request {request_id}: ${cost_info['daily_total']:.2f}")
+
+        # Track cost (cache hits cost nothing - no API calls were made)
+        if not cache_hit:
+            cost_info = add_cost(
+                amount_usd=result.get('cost_usd', 0.0),
+                request_id=request_id,
+                source='rag_query'
+            )
+
+            # Check if cost limit was exceeded after this request
+            if cost_info['limit_exceeded']:
+                logger.warning(f"Cost limit exceeded after request {request_id}: ${cost_info['daily_total']:.2f}")
         
         # For suspicious queries (threat_score > 0.5), suppress sources to prevent information leakage
         # Still provide an answer, but don't expose document chunks
@@ -211,15 +253,20 @@ async def query_documents(request: QueryRequest, req: Request):
                 else:
                     MIN_RELEVANCE_SCORE = 0.30  # Standard threshold
                 
-                # Log all scores before filtering
-                score_list = [f"{s.get('score', 0.0):.3f}" for s in raw_sources]
-                logger.info(f"All source scores before filtering: {score_list}")
-                
+                # Score the sources once into a NumPy array - the threshold
+                # mask, the log line, and the min/max in the fallback below
+                # all reuse it instead of re-walking the dicts
+                scores = np.fromiter(
+                    (s.get('score', 0.0) for s in raw_sources),
+                    dtype=np.float32,
+                    count=len(raw_sources)
+                )
+                logger.info(f"All source scores before filtering: {[f'{s:.3f}' for s in scores]}")
+
                 filtered_sources = [
-                    src for src in raw_sources
-                    if src.get('score', 0.0) >= MIN_RELEVANCE_SCORE
+                    raw_sources[i] for i in np.flatnonzero(scores >= MIN_RELEVANCE_SCORE)
                 ]
-                
+
                 if len(filtered_sources) < len(raw_sources):
                     logger.info(
                         f"Filtered out {len(raw_sources) - len(filtered_sources)} sources below {MIN_RELEVANCE_SCORE*100:.0f}% relevance threshold. "
@@ -228,9 +275,9 @@ async def query_documents(request: QueryRequest, req: Request):
                 
                 # If no sources pass the threshold but we have sources, check if we should show any
                 if len(filtered_sources) == 0 and len(raw_sources) > 0:
-                    max_score = max(s.get('score', 0.0) for s in raw_sources)
-                    min_score = min(s.get('score', 0.0) for s in raw_sources)
-                    
+                    max_score = float(scores.max())
+                    min_score = float(scores.min())
+
                     logger.warning(
                         f"No sources passed relevance threshold ({MIN_RELEVANCE_SCORE*100:.0f}%). "
                         f"All {len(raw_sources)} sources filtered out. "
@@ -254,26 +301,29 @@ async def query_documents(request: QueryRequest, req: Request):
                     elif not is_comparison:
                         logger.info(f"Not a comparison query and no sources passed threshold. Not showing sources.")
                 
-                # Format sources with search method metadata
+                # Format sources with search method metadata as plain dicts
+                # matching the Source schema - the RAG service already
+                # produced this data, so re-validating it through Pydantic
+                # model construction is wasted work on the hot path
                 sources = [
-                    Source(
-                        document_name=src['document_name'],
-                        page_number=src['page_number'],
-                        text=src['text'],
-                        score=src['score'],
-                        search_method=src.get('search_method', 'semantic'),
-                        matched_keywords=src.get('matched_keywords')
-                    )
+                    {
+                        "document_name": src['document_name'],
+                        "page_number": src['page_number'],
+                        "text": src['text'],
+                        "score": src['score'],
+                        "search_method": src.get('search_method', 'semantic'),
+                        "matched_keywords": src.get('matched_keywords')
+                    }
                     for src in filtered_sources
                 ]
-                
+
                 logger.info(f"Final sources count: {len(sources)}")
-        
-        return QueryResponse(
-            answer=result['answer'],
-            sources=sources,
-            query=result['query']
-        )
+
+        return ORJSONResponse(content={
+            "answer": result['answer'],
+            "sources": sources,
+            "query": result['query']
+        })
         
     except HTTPException:
         raise
@@ -286,6 +336,108 @@ async def query_documents(request: QueryRequest, req: Request):
         raise HTTPException(status_code=500, detail="An error occurred processing your query. Please try again.")
 
 
+@router.post("/batch_query", response_model=BatchQueryResponse, response_class=ORJSONResponse)
+async def batch_query_documents(request: BatchQueryRequest, req: Request):
+    """
+    Answer multiple independent queries in one request.
+
+    Embeds all queries in a single OpenAI call, runs the Pinecone lookups
+    concurrently, and generates the answers in parallel - N queries cost
+    roughly one round trip per pipeline stage instead of N.
+
+    Uses single-shot semantic retrieval (no hybrid merge or reranking).
+
+    Security: Rate limited, input validated, cost limited.
+    """
+    # Cheaper than uuid4: one urandom read, no hyphen formatting
+    request_id = secrets.token_hex(16)
+
+    try:
+        # Check cost limit before processing
+        limit_exceeded, current_cost, limit = check_cost_limit()
+        if limit_exceeded:
+            logger.warning(f"Cost limit exceeded: ${current_cost:.2f} >= ${limit}")
+            raise HTTPException(
+                status_code=429,
+                detail=f"Daily cost limit exceeded (${current_cost:.2f}/${limit}). Please try again later."
+            )
+
+        # Validate and sanitize every query up front
+        sanitized_queries = []
+        for query in request.queries:
+            validation_result = validate_query(query)
+            if not validation_result.is_valid:
+                logger.warning(f"Invalid query in batch rejected: {validation_result.warnings}")
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Invalid query: {', '.join(validation_result.warnings)}"
+                )
+            sanitized_queries.append(validation_result.sanitized_query)
+
+        validated_top_k = validate_top_k(request.top_k, max_top_k=20)
+        rag_service = get_rag_service()
+
+        logger.info(f"Processing batch of {len(sanitized_queries)} queries (top_k={validated_top_k})")
+
+        # Stage 1: one embedding call for the whole batch
+        embeddings = await asyncio.to_thread(
+            rag_service.embedding_service.generate_embeddings_batch,
+            sanitized_queries
+        )
+
+        # Stage 2: Pinecone lookups in parallel
+        search_results = await asyncio.gather(*[
+            asyncio.to_thread(
+                rag_service.pinecone_service.search,
+                query_vector=embedding,
+                top_k=validated_top_k
+            )
+            for embedding in embeddings
+        ])
+
+        # Stage 3: answer generation in parallel
+        answers = await asyncio.gather(*[
+            asyncio.to_thread(rag_service.generate_answer, query, chunks)
+            for query, chunks in zip(sanitized_queries, search_results)
+        ])
+
+        total_cost = 0.0
+        results = []
+        for query, chunks, (answer, llm_cost) in zip(sanitized_queries, search_results, answers):
+            total_cost += llm_cost
+            sources = [
+                {
+                    "document_name": chunk.get('metadata', {}).get('document_name', 'Unknown'),
+                    "page_number": chunk.get('metadata', {}).get('page_number', 0),
+                    "text": chunk.get('metadata', {}).get('text', '')[:500],
+                    "score": chunk.get('score', 0.0),
+                    "search_method": "semantic",
+                    "matched_keywords": None
+                }
+                for chunk in chunks
+            ]
+            results.append({"answer": answer, "sources": sources, "query": query})
+
+        cost_info = add_cost(
+            amount_usd=total_cost,
+            request_id=request_id,
+            source='batch_query'
+        )
+        if cost_info['limit_exceeded']:
+            logger.warning(f"Cost limit exceeded after batch request {request_id}: ${cost_info['daily_total']:.2f}")
+
+        return ORJSONResponse(content={"results": results})
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        logger.warning(f"Validation error: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error processing batch query: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="An error occurred processing your queries. Please try again.")
+
+
 @router.post("/upload", response_model=DocumentUploadResponse)
 async def upload_document():
     """
@@ -307,70 +459,100 @@ async def get_cost_summary_endpoint(req: Request):
     Security: Requires API key if configured.
     """
     summary = get_cost_summary()
-    return summary
 
+    # Short-lived cache headers: a slightly stale budget display is fine
+    # and saves the dashboard's polling from hitting Python every time
+    body = orjson.dumps(summary)
+    etag = f'"{hashlib.md5(body).hexdigest()}"'
+
+    if req.headers.get("if-none-match") == etag:
+        return Response(status_code=304)
+
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"ETag": etag, "Cache-Control": _COSTS_CACHE_CONTROL}
+    )
+
+
+def refresh_documents_listing() -> List[Dict[str, Any]]:
+    """
+    Rebuild the document listing and store it in the TTL cache.
+
+    Shared by the /documents endpoint and the startup warm-up in main.py,
+    so the first request after boot is served from memory like every
+    other one.
+    """
+    unique_docs = set()
+
+    try:
+        # Enumerate documents via the index ID listing - no embedding
+        # call, no vector payloads, and no risk of documents falling
+        # outside a probe query's top_k
+        unique_docs = get_rag_service().pinecone_service.list_document_names()
+
+        logger.info(f"Found {len(unique_docs)} unique documents from Pinecone")
+
+    except Exception as e:
+        logger.warning(f"Could not fetch documents from Pinecone: {e}. Using file system fallback.")
+        # Fallback: list files from docs directory
+        if _DOCS_DIR.exists():
+            unique_docs = {f.name for f in _DOCS_DIR.glob("*.pdf")}
+
+    # One scandir pass instead of an exists() + stat() pair per document
+    # (2N syscalls -> 1 directory read)
+    fs_index: Dict[str, int] = {}
+    try:
+        with os.scandir(_DOCS_DIR) as it:
+            fs_index = {e.name: e.stat().st_size for e in it if e.is_file()}
+    except OSError:
+        pass  # Directory may not exist in production (Railway)
+
+    # Convert to list and get file info
+    documents = []
+
+    for doc_name in sorted(unique_docs):
+        # In production (Railway), files may not exist on filesystem
+        # but we still want to show them if they're in Pinecone
+        file_size = fs_index.get(doc_name)
+
+        # Plain dicts matching the DocumentInfo schema - returning a
+        # Response directly skips FastAPI's per-item model revalidation
+        documents.append({
+            "name": doc_name,
+            "status": "available",  # Always show as available if found in Pinecone
+            "file_size": file_size
+        })
 
-@router.get("/documents", response_model=List[DocumentInfo])
+    logger.info(f"Returning {len(documents)} documents")
+    _DOCS_CACHE["data"] = documents
+    _DOCS_CACHE["etag"] = f'"{hashlib.md5(orjson.dumps(documents)).hexdigest()}"'
+    _DOCS_CACHE["ts"] = time.monotonic()
+    return documents
+
+
+@router.get("/documents", response_model=List[DocumentInfo], response_class=ORJSONResponse)
 async def list_documents(req: Request):
     """
     List all available documents in the system.
     Returns unique document names from Pinecone metadata.
-    
+
     Security: Rate limited to prevent abuse.
     """
     try:
-        unique_docs = set()
-        
-        try:
-            # Use a meaningful query to get document metadata
-            # Query with a common financial term to get diverse results
-            from services.embedding_service import EmbeddingService
-            embedding_service = EmbeddingService()
-            query_text = "financial document company"
-            query_embedding = embedding_service.generate_embedding(query_text)
-            
-            # Get a large sample of results
-            results = rag_service.pinecone_service.search(
-                query_vector=query_embedding,
-                top_k=500,  # Get a large sample
-                namespace=""
-            )
-            
-            # Extract unique document names from metadata
-            for result in results:
-                metadata = result.get('metadata', {})
-                doc_name = metadata.get('document_name')
-                if doc_name:
-                    unique_docs.add(doc_name)
-            
-            logger.info(f"Found {len(unique_docs)} unique documents from Pinecone")
-            
-        except Exception as e:
-            logger.warning(f"Could not fetch documents from Pinecone: {e}. Using file system fallback.")
-            # Fallback: list files from docs directory
-            docs_path = Path(DOCS_DIR)
-            if docs_path.exists():
-                unique_docs = {f.name for f in docs_path.glob("*.pdf")}
-        
-        # Convert to list and get file info
-        documents = []
-        docs_path = Path(DOCS_DIR)
-        
-        for doc_name in sorted(unique_docs):
-            file_path = docs_path / doc_name
-            # In production (Railway), files may not exist on filesystem
-            # but we still want to show them if they're in Pinecone
-            file_size = file_path.stat().st_size if file_path.exists() else None
-            
-            documents.append(DocumentInfo(
-                name=doc_name,
-                status="available",  # Always show as available if found in Pinecone
-                file_size=file_size
-            ))
-        
-        logger.info(f"Returning {len(documents)} documents")
-        return documents
-        
+        # Serve from cache while fresh - the inventory changes rarely
+        if _DOCS_CACHE["data"] is None or time.monotonic() - _DOCS_CACHE["ts"] >= _DOCS_TTL:
+            await asyncio.to_thread(refresh_documents_listing)
+
+        etag = _DOCS_CACHE["etag"]
+        if req.headers.get("if-none-match") == etag:
+            return Response(status_code=304)
+
+        return ORJSONResponse(
+            content=_DOCS_CACHE["data"],
+            headers={"ETag": etag, "Cache-Control": _DOCS_CACHE_CONTROL}
+        )
+
     except Exception as e:
         logger.error(f"Error listing documents: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error listing documents: {str(e)}")
@@ -390,30 +572,43 @@ async def download_document(filename: str, req: Request):
         except ValueError as e:
             raise HTTPException(status_code=400, detail="Invalid filename")
         
-        # Ensure filename is within allowed directory
-        file_path = Path(DOCS_DIR) / sanitized_filename
-        
         # Resolve path to prevent directory traversal
         try:
-            file_path = file_path.resolve()
-            docs_dir_resolved = Path(DOCS_DIR).resolve()
-            
-            # Ensure the resolved path is within the docs directory
-            if not str(file_path).startswith(str(docs_dir_resolved)):
+            file_path = (_DOCS_DIR / sanitized_filename).resolve()
+
+            # Ensure the resolved path is within the docs directory.
+            # Path.parents membership is symlink-safe, unlike a string
+            # prefix check ("/docs-evil" startswith "/docs")
+            if _DOCS_DIR not in file_path.parents:
                 raise HTTPException(status_code=400, detail="Invalid filename")
+        except HTTPException:
+            raise
         except Exception:
             raise HTTPException(status_code=400, detail="Invalid filename")
         
-        if not file_path.exists():
-            raise HTTPException(status_code=404, detail="Document not found")
-        
         if not file_path.suffix.lower() == ".pdf":
             raise HTTPException(status_code=400, detail="Only PDF files are available")
-        
+
+        # Stat once and hand the result to Starlette: it skips its own
+        # re-stat and can take the sendfile() zero-copy path instead of
+        # buffering the PDF through the event loop. The stat-derived ETag
+        # lets browsers revalidate instead of re-downloading.
+        try:
+            stat_result = file_path.stat()
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Document not found")
+
+        etag = f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+        if req.headers.get("if-none-match") == etag:
+            return Response(status_code=304)
+
         return FileResponse(
             path=str(file_path),
             filename=sanitized_filename,
-            media_type="application/pdf"
+            media_type="application/pdf",
+            stat_result=stat_result,
+            headers={"ETag": etag}
         )
         
     except HTTPException:
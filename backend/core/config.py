@@ -15,6 +15,7 @@ class Settings(BaseSettings):
     # API Configuration
     API_HOST: str = "0.0.0.0"
     API_PORT: int = 8000
+    WORKERS: int = 1  # Uvicorn worker processes (production)
     
     # Security Configuration
     API_KEYS: str = ""  # Comma-separated list of valid API keys
@@ -25,11 +26,20 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: str
     OPENAI_MODEL: str = "gpt-4-turbo-preview"
     OPENAI_EMBEDDING_MODEL: str = "text-embedding-3-large"
+    # Matryoshka truncation for v3 embedding models (e.g. 1024). 0 keeps the
+    # model's native dimension. Changing this requires re-ingesting into an
+    # index created with the matching dimension.
+    EMBEDDING_DIMENSIONS: int = 0
+    # Texts per embeddings API call during bulk ingestion (API max: 2048)
+    EMBEDDING_BATCH_SIZE: int = 100
     
     # Pinecone Configuration
     PINECONE_API_KEY: str
     PINECONE_ENVIRONMENT: str = "us-east-1"
     PINECONE_INDEX_NAME: str = "investment-research"
+    # Use the gRPC client (lower per-RPC overhead, parallel upserts) when the
+    # pinecone[grpc] extra is installed
+    PINECONE_USE_GRPC: bool = False
     
     # Optional: Cohere for reranking
     COHERE_API_KEY: str = ""
@@ -39,6 +49,17 @@ class Settings(BaseSettings):
     CHUNK_OVERLAP: int = 200
     TOP_K_RESULTS: int = 10
     RERANK_TOP_K: int = 5
+    # How many candidates to retrieve per requested result when reranking
+    # (retrieve top_k * multiplier, rerank, keep top_k). A wider pool gives
+    # the reranker more to work with at the cost of a larger rerank call.
+    RERANK_CANDIDATE_MULTIPLIER: int = 2
+    # Cache full RAG answers in-process: repeated identical questions skip
+    # the embedding + Pinecone + LLM round trip entirely
+    ENABLE_LLM_CACHE: bool = True
+    # Token budget for LLM prompt context. Chunks are packed greedily until
+    # the budget is spent (requires tiktoken; falls back to per-chunk char
+    # truncation without it). Input cost is linear in prompt tokens.
+    CONTEXT_TOKEN_BUDGET: int = 6000
     
     class Config:
         env_file = ".env"
@@ -4,9 +4,10 @@ Cost tracking and budget management for Investment Research Assistant
 Tracks API costs per request and enforces daily limits.
 """
 import logging
+import threading
+import time
 from datetime import datetime
 from typing import Dict, Optional
-from collections import defaultdict
 import os
 
 logger = logging.getLogger(__name__)
@@ -14,32 +15,113 @@ logger = logging.getLogger(__name__)
 # Configuration from environment
 MAX_DAILY_COST_USD = float(os.getenv("MAX_DAILY_COST_USD", "20.0"))
 RESET_HOUR = int(os.getenv("COST_RESET_HOUR", "0"))  # Midnight UTC
-
-# In-memory cost tracking (in production, use Redis or database)
-_daily_costs: Dict[str, float] = defaultdict(float)  # date -> total cost
+REDIS_URL = os.getenv("REDIS_URL", "")
+
+# Optional Redis backend. With multiple Uvicorn workers the in-memory
+# total is per-process, which silently turns a $20 daily limit into
+# $20 x workers. Redis INCRBYFLOAT keeps one atomic counter shared by
+# every worker; without Redis we fall back to the in-memory tracker.
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+_redis_client = None
+if REDIS_URL and REDIS_AVAILABLE:
+    try:
+        _redis_client = redis.Redis.from_url(REDIS_URL, decode_responses=True, socket_timeout=1.0)
+        _redis_client.ping()
+        logger.info("Cost tracker using Redis backend")
+    except Exception as e:
+        logger.warning(f"Could not connect to Redis, using in-memory cost tracking: {e}")
+        _redis_client = None
+elif REDIS_URL and not REDIS_AVAILABLE:
+    logger.warning("REDIS_URL is set but the redis package is not installed, using in-memory cost tracking")
+
+_COST_KEY_TTL = 172800  # keep cost keys for two days
+
+# In-memory cost tracking (in production, use Redis or database).
+# A single date scalar + running total replaces the old per-date dict,
+# which was scanned and pruned on every call for a value that changes
+# once a day.
+_current_date: str = ""
+_current_total: float = 0.0
 _cost_tracking: Dict[str, Dict] = {}  # request_id -> cost details
+_lock = threading.Lock()
+
+
+# Memoized clock reads. utcnow() + strftime costs hundreds of ns and is
+# called several times per request; a 1-second window is far finer than
+# the daily granularity anything here needs.
+_date_cache = {"ts": 0.0, "date": ""}
+_hour_cache = {"ts": 0.0, "hour": 0}
 
 
 def get_current_date() -> str:
     """Get current date string for cost tracking"""
-    return datetime.utcnow().strftime("%Y-%m-%d")
+    now = time.time()
+    if now - _date_cache["ts"] > 1.0:
+        _date_cache["date"] = datetime.utcnow().strftime("%Y-%m-%d")
+        _date_cache["ts"] = now
+    return _date_cache["date"]
 
 
 def get_current_hour() -> int:
     """Get current hour in UTC"""
-    return datetime.utcnow().hour
+    now = time.time()
+    if now - _hour_cache["ts"] > 1.0:
+        _hour_cache["hour"] = datetime.utcnow().hour
+        _hour_cache["ts"] = now
+    return _hour_cache["hour"]
+
+
+def _redis_add_cost(amount_usd: float, date: str) -> Optional[float]:
+    """
+    Atomically add cost in Redis and return the new daily total.
+
+    Returns None if Redis is unavailable so callers can fall back to the
+    in-memory tracker.
+    """
+    if _redis_client is None:
+        return None
+
+    try:
+        key = f"cost:{date}"
+        new_total = float(_redis_client.incrbyfloat(key, amount_usd))
+        _redis_client.expire(key, _COST_KEY_TTL)
+        return new_total
+    except Exception as e:
+        logger.warning(f"Redis cost update failed, falling back to in-memory tracking: {e}")
+        return None
+
+
+def _redis_get_cost(date: str) -> Optional[float]:
+    """
+    Read the daily total from Redis.
+
+    Returns None if Redis is unavailable so callers can fall back to the
+    in-memory tracker.
+    """
+    if _redis_client is None:
+        return None
+
+    try:
+        value = _redis_client.get(f"cost:{date}")
+        return float(value) if value is not None else 0.0
+    except Exception as e:
+        logger.warning(f"Redis cost read failed, falling back to in-memory tracking: {e}")
+        return None
 
 
 def reset_daily_costs_if_needed():
-    """Reset daily costs if it's a new day"""
-    current_date = get_current_date()
-    # Remove old entries (keep only today and yesterday)
-    dates_to_remove = [
-        date for date in _daily_costs.keys()
-        if date < current_date
-    ]
-    for date in dates_to_remove:
-        del _daily_costs[date]
+    """Reset the running total if it's a new day (caller must hold _lock)"""
+    global _current_date, _current_total
+
+    today = get_current_date()
+    if today != _current_date:
+        _current_date = today
+        _current_total = 0.0
 
 
 def add_cost(amount_usd: float, request_id: Optional[str] = None, source: str = "unknown") -> Dict[str, any]:
@@ -54,11 +136,18 @@ def add_cost(amount_usd: float, request_id: Optional[str] = None, source: str =
     Returns:
         Dict with current daily total and whether limit exceeded
     """
-    reset_daily_costs_if_needed()
+    global _current_total
+
     current_date = get_current_date()
-    
-    _daily_costs[current_date] += amount_usd
-    
+    daily_total = _redis_add_cost(amount_usd, current_date)
+
+    if daily_total is None:
+        with _lock:
+            reset_daily_costs_if_needed()
+            current_date = _current_date
+            _current_total += amount_usd
+            daily_total = _current_total
+
     # Track detailed cost if request_id provided
     if request_id:
         _cost_tracking[request_id] = {
@@ -67,8 +156,7 @@ def add_cost(amount_usd: float, request_id: Optional[str] = None, source: str =
             "timestamp": datetime.utcnow().isoformat(),
             "date": current_date
         }
-    
-    daily_total = _daily_costs[current_date]
+
     limit_exceeded = daily_total >= MAX_DAILY_COST_USD
     
     logger.info(
@@ -93,35 +181,49 @@ def add_cost(amount_usd: float, request_id: Optional[str] = None, source: str =
 
 def get_daily_cost() -> float:
     """Get current daily cost"""
-    reset_daily_costs_if_needed()
-    current_date = get_current_date()
-    return _daily_costs.get(current_date, 0.0)
+    total = _redis_get_cost(get_current_date())
+    if total is not None:
+        return total
+
+    with _lock:
+        reset_daily_costs_if_needed()
+        return _current_total
 
 
 def check_cost_limit() -> tuple[bool, float, float]:
     """
     Check if daily cost limit has been exceeded.
-    
+
     Returns:
         (limit_exceeded, current_cost, limit)
     """
-    reset_daily_costs_if_needed()
-    current_date = get_current_date()
-    current_cost = _daily_costs.get(current_date, 0.0)
+    current_cost = _redis_get_cost(get_current_date())
+
+    if current_cost is None:
+        with _lock:
+            reset_daily_costs_if_needed()
+            current_cost = _current_total
+
     limit_exceeded = current_cost >= MAX_DAILY_COST_USD
-    
+
     return limit_exceeded, current_cost, MAX_DAILY_COST_USD
 
 
 def get_cost_summary() -> Dict[str, any]:
     """Get summary of costs"""
-    reset_daily_costs_if_needed()
     current_date = get_current_date()
-    
+    daily_total = _redis_get_cost(current_date)
+
+    if daily_total is None:
+        with _lock:
+            reset_daily_costs_if_needed()
+            current_date = _current_date
+            daily_total = _current_total
+
     return {
         "date": current_date,
-        "daily_total": _daily_costs.get(current_date, 0.0),
+        "daily_total": daily_total,
         "daily_limit": MAX_DAILY_COST_USD,
-        "limit_exceeded": _daily_costs.get(current_date, 0.0) >= MAX_DAILY_COST_USD,
-        "remaining_budget": max(0, MAX_DAILY_COST_USD - _daily_costs.get(current_date, 0.0))
+        "limit_exceeded": daily_total >= MAX_DAILY_COST_USD,
+        "remaining_budget": max(0, MAX_DAILY_COST_USD - daily_total)
     }
@@ -0,0 +1,59 @@
+"""
+Shared HTTP client for upstream API calls.
+
+One pooled httpx client per worker process, shared by every service that
+talks to OpenAI. Without it each OpenAI client builds its own pool, so
+concurrent /query and /batch_query traffic pays repeated TCP + TLS
+handshakes instead of reusing warm keep-alive connections. HTTP/2
+multiplexes concurrent calls over a single connection when the upstream
+supports it.
+"""
+import atexit
+import logging
+from typing import Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Generous keep-alive pool: batch endpoints fan out dozens of concurrent
+# upstream calls per request
+_LIMITS = httpx.Limits(max_keepalive_connections=100, max_connections=200)
+# Tight connect timeout: a dead upstream should fail in seconds, not hold
+# a worker thread for the full read timeout
+_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+
+_sync_client: Optional[httpx.Client] = None
+_async_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.Client:
+    """Return the shared synchronous httpx client for this worker process"""
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = httpx.Client(http2=True, limits=_LIMITS, timeout=_TIMEOUT)
+        # Safety net for non-FastAPI entry points (ingestion scripts):
+        # the app itself closes clients in the lifespan shutdown
+        atexit.register(_sync_client.close)
+        logger.info("Shared HTTP client created (http2, pooled connections)")
+    return _sync_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Return the shared asynchronous httpx client for this worker process"""
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(http2=True, limits=_LIMITS, timeout=_TIMEOUT)
+        logger.info("Shared async HTTP client created (http2, pooled connections)")
+    return _async_client
+
+
+async def close_http_clients():
+    """Close the shared clients (called from the FastAPI lifespan shutdown)"""
+    global _sync_client, _async_client
+    if _sync_client is not None:
+        _sync_client.close()
+        _sync_client = None
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
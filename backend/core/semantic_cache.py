@@ -0,0 +1,209 @@
+"""
+Semantic response cache for RAG queries
+
+Caches full query responses in two layers:
+1. Exact layer: normalized query string -> response (hash lookup)
+2. Semantic layer: query embedding -> response via cosine similarity,
+   so near-duplicate phrasings of a recent question also hit the cache
+
+A hit bypasses the entire RAG pipeline (embedding + Pinecone + LLM),
+which is where virtually all of the request latency and API cost lives.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Cache tuning defaults
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_TTL_SECONDS = 3600.0  # 1 hour
+DEFAULT_SIMILARITY_THRESHOLD = 0.97  # cosine similarity for a "same question" hit
+
+
+class SemanticQueryCache:
+    """Two-layer (exact + embedding similarity) response cache"""
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD
+    ):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Maximum number of cached responses (LRU eviction)
+            ttl_seconds: Time-to-live for cached responses
+            similarity_threshold: Minimum cosine similarity for a semantic hit
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+
+        # Exact layer: query hash -> (timestamp, params, response)
+        self._exact: "OrderedDict[str, Tuple[float, Tuple, Dict[str, Any]]]" = OrderedDict()
+
+        # Semantic layer: matrix of L2-normalized embeddings with parallel
+        # lists of timestamps, params, and responses (row i corresponds to
+        # entry i in each list)
+        self._vectors: Optional[np.ndarray] = None  # shape [N, dim], float32
+        self._timestamps: List[float] = []
+        self._params: List[Tuple] = []
+        self._responses: List[Dict[str, Any]] = []
+
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _exact_key(query: str, params: Tuple) -> str:
+        """Build the exact-match cache key from the normalized query and params"""
+        normalized = query.strip().lower()
+        return hashlib.sha256(f"{normalized}|{params}".encode()).hexdigest()
+
+    @staticmethod
+    def _normalize_embedding(embedding: List[float]) -> np.ndarray:
+        """Convert an embedding to a unit-length float32 vector"""
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        if norm > 0:
+            vec = vec / norm
+        return vec
+
+    def get_exact(self, query: str, params: Tuple = ()) -> Optional[Dict[str, Any]]:
+        """
+        Look up a response by exact (normalized) query string.
+
+        Args:
+            query: User query
+            params: Request parameters that affect the response (e.g. top_k)
+
+        Returns:
+            Cached response dict, or None on miss
+        """
+        key = self._exact_key(query, params)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._exact.get(key)
+            if entry is None:
+                return None
+
+            timestamp, _, response = entry
+            if now - timestamp > self.ttl_seconds:
+                del self._exact[key]
+                return None
+
+            # Refresh LRU position
+            self._exact.move_to_end(key)
+            logger.info("Semantic cache: exact hit")
+            return response
+
+    def get_semantic(self, embedding: List[float], params: Tuple = ()) -> Optional[Dict[str, Any]]:
+        """
+        Look up a response by embedding similarity.
+
+        Args:
+            embedding: Query embedding vector
+            params: Request parameters that affect the response (e.g. top_k)
+
+        Returns:
+            Cached response dict if the best match clears the similarity
+            threshold, or None on miss
+        """
+        with self._lock:
+            self._evict_expired()
+
+            if self._vectors is None or len(self._responses) == 0:
+                return None
+
+            query_vec = self._normalize_embedding(embedding)
+            sims = self._vectors @ query_vec
+
+            # Consider only entries whose params match
+            best_idx = -1
+            best_sim = self.similarity_threshold
+            for idx in np.argsort(sims)[::-1]:
+                if sims[idx] < best_sim:
+                    break
+                if self._params[idx] == params:
+                    best_idx = int(idx)
+                    best_sim = float(sims[idx])
+                    break
+
+            if best_idx < 0:
+                return None
+
+            logger.info(f"Semantic cache: similarity hit (score={best_sim:.3f})")
+            return self._responses[best_idx]
+
+    def put(
+        self,
+        query: str,
+        embedding: Optional[List[float]],
+        response: Dict[str, Any],
+        params: Tuple = ()
+    ):
+        """
+        Store a response in both cache layers.
+
+        Args:
+            query: User query
+            embedding: Query embedding (semantic layer skipped if None)
+            response: Full response payload to cache
+            params: Request parameters that affect the response
+        """
+        now = time.monotonic()
+        key = self._exact_key(query, params)
+
+        with self._lock:
+            self._exact[key] = (now, params, response)
+            self._exact.move_to_end(key)
+            while len(self._exact) > self.max_entries:
+                self._exact.popitem(last=False)
+
+            if embedding is not None:
+                vec = self._normalize_embedding(embedding)
+                if self._vectors is None:
+                    self._vectors = vec[np.newaxis, :]
+                else:
+                    self._vectors = np.vstack([self._vectors, vec])
+                self._timestamps.append(now)
+                self._params.append(params)
+                self._responses.append(response)
+
+                # Bound the semantic layer as well
+                if len(self._responses) > self.max_entries:
+                    excess = len(self._responses) - self.max_entries
+                    self._drop_rows(list(range(excess)))
+
+    def _evict_expired(self):
+        """Drop expired semantic-layer entries (caller must hold the lock)"""
+        if self._vectors is None or not self._timestamps:
+            return
+
+        now = time.monotonic()
+        expired = [
+            i for i, ts in enumerate(self._timestamps)
+            if now - ts > self.ttl_seconds
+        ]
+        if expired:
+            self._drop_rows(expired)
+
+    def _drop_rows(self, indices: List[int]):
+        """Remove rows from the semantic layer (caller must hold the lock)"""
+        keep_mask = np.ones(len(self._timestamps), dtype=bool)
+        keep_mask[indices] = False
+
+        self._vectors = self._vectors[keep_mask]
+        self._timestamps = [ts for i, ts in enumerate(self._timestamps) if keep_mask[i]]
+        self._params = [p for i, p in enumerate(self._params) if keep_mask[i]]
+        self._responses = [r for i, r in enumerate(self._responses) if keep_mask[i]]
+
+        if len(self._responses) == 0:
+            self._vectors = None
@@ -2,17 +2,28 @@
 Investment Research Assistant - FastAPI Backend
 Main application entry point
 """
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from contextlib import asynccontextmanager
 import logging
+import orjson
+import os
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 
+# Optional uvloop event loop - roughly 2x faster than stock asyncio.
+# Installed before the app is created so uvicorn picks it up.
+try:
+    import uvloop
+    uvloop.install()
+except ImportError:
+    uvloop = None
+
 from api.routes import router as api_router
 from core.config import settings
+from core.http_client import close_http_clients
 
 # Configure logging
 logging.basicConfig(
@@ -21,8 +32,104 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Initialize rate limiter
-limiter = Limiter(key_func=get_remote_address)
+# Initialize rate limiter. With REDIS_URL set the counters live in Redis and
+# are shared across uvicorn workers - per-process in-memory counters would
+# give each client N workers times the intended allowance and reset on
+# restart. Same env var the cost tracker uses.
+_REDIS_URL = os.getenv("REDIS_URL", "")
+try:
+    limiter = Limiter(
+        key_func=get_remote_address,
+        storage_uri=_REDIS_URL or "memory://",
+    )
+    logger.info(f"Rate limiter storage: {'redis' if _REDIS_URL else 'in-memory'}")
+except Exception as e:
+    logger.warning(f"Could not initialize Redis rate-limit storage: {e} - using in-memory")
+    limiter = Limiter(key_func=get_remote_address)
+
+
+class _BodyTooLarge(Exception):
+    """Raised by the size-limiting receive wrapper when a body exceeds the cap"""
+
+
+class BodySizeLimitMiddleware:
+    """
+    ASGI middleware that rejects request bodies over max_size bytes.
+
+    Counts bytes as they arrive on the receive channel, so chunked uploads
+    without a Content-Length header are limited too; the header, when
+    present, is still checked up front to fail fast.
+    """
+
+    _413_BODY = orjson.dumps({"detail": "Request body too large. Maximum size: 1MB"})
+
+    def __init__(self, app, max_size: int = 1024 * 1024):
+        self.app = app
+        self.max_size = max_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Fail fast on a declared oversized body
+        for name, value in scope.get("headers", []):
+            if name == b"content-length":
+                try:
+                    if int(value) > self.max_size:
+                        await self._send_413(send)
+                        return
+                except ValueError:
+                    pass
+                break
+
+        received = 0
+        response_started = False
+
+        async def wrapped_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_size:
+                    raise _BodyTooLarge()
+            return message
+
+        async def wrapped_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, wrapped_receive, wrapped_send)
+        except _BodyTooLarge:
+            # Only answer if the app hasn't started responding yet;
+            # otherwise the connection is already unusable
+            if not response_started:
+                await self._send_413(send)
+
+    async def _send_413(self, send):
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(self._413_BODY)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": self._413_BODY})
+
+# Snapshot the valid API keys once: settings.VALID_API_KEYS is a property
+# that re-splits the env string on every access, and keys only change with a
+# redeploy. A frozenset gives O(1) hashed membership on the hot path.
+_VALID_API_KEYS = frozenset(settings.VALID_API_KEYS)
+
+# Auth-exempt paths (health checks, docs). Exact matches are a frozenset
+# lookup; the doc UIs get prefix matches so their subpaths (e.g. the OAuth
+# redirect under /docs) are covered too.
+_PUBLIC_PATHS = frozenset(["/", "/health", "/openapi.json"])
+_PUBLIC_PREFIXES = ("/docs", "/redoc")
 
 
 @asynccontextmanager
@@ -33,13 +140,30 @@ async def lifespan(app: FastAPI):
     """
     logger.info("🚀 Starting Investment Research Assistant API")
     logger.info(f"Environment: {settings.ENVIRONMENT}")
-    
-    # Startup: Initialize services
-    # We'll add Pinecone initialization here later
-    
+
+    # Startup: Warm the shared service singletons so the first request
+    # doesn't pay the cold-start cost (OpenAI/Pinecone client setup)
+    try:
+        from api.routes import get_rag_service
+        get_rag_service()
+        logger.info("RAG service initialized at startup")
+    except Exception as e:
+        logger.warning(f"Could not initialize RAG service at startup: {e}")
+
+    # Prime the /documents cache so the first dashboard load doesn't pay
+    # for the Pinecone enumeration
+    try:
+        from api.routes import refresh_documents_listing
+        import asyncio
+        await asyncio.to_thread(refresh_documents_listing)
+        logger.info("Document listing warmed at startup")
+    except Exception as e:
+        logger.warning(f"Could not warm document listing at startup: {e}")
+
     yield
-    
+
     # Shutdown: Cleanup resources
+    await close_http_clients()
     logger.info("👋 Shutting down Investment Research Assistant API")
 
 
@@ -49,6 +173,7 @@ app = FastAPI(
     description="RAG-based financial document analysis and research system",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # Add rate limiter to app
@@ -71,11 +196,12 @@ app.add_middleware(
 async def verify_api_key(request: Request, call_next):
     """Verify API key for protected endpoints"""
     # Skip auth for health check endpoints and OPTIONS (preflight) requests
-    if request.url.path in ["/", "/health", "/docs", "/openapi.json", "/redoc"] or request.method == "OPTIONS":
+    path = request.url.path
+    if path in _PUBLIC_PATHS or path.startswith(_PUBLIC_PREFIXES) or request.method == "OPTIONS":
         return await call_next(request)
-    
+
     # Check if API keys are configured
-    valid_keys = settings.VALID_API_KEYS
+    valid_keys = _VALID_API_KEYS
     if valid_keys:
         # Get API key from header
         api_key = request.headers.get("X-API-Key") or request.headers.get("Authorization", "").replace("Bearer ", "")
@@ -92,35 +218,28 @@ async def verify_api_key(request: Request, call_next):
     
     return await call_next(request)
 
-# Request size limit middleware
-@app.middleware("http")
-async def limit_request_size(request: Request, call_next):
-    """Limit request body size to prevent DoS attacks"""
-    max_size = 1024 * 1024  # 1MB
-    
-    if request.headers.get("content-length"):
-        content_length = int(request.headers["content-length"])
-        if content_length > max_size:
-            return JSONResponse(
-                status_code=413,
-                content={"detail": "Request body too large. Maximum size: 1MB"}
-            )
-    
-    response = await call_next(request)
-    return response
+# Enforce the body size limit at the ASGI layer: checking only the
+# Content-Length header lets a chunked client stream an arbitrarily large
+# body, so the receive channel itself counts bytes
+app.add_middleware(BodySizeLimitMiddleware, max_size=1024 * 1024)
 
 # Include API routes
 app.include_router(api_router, prefix="/api/v1")
 
 
+# Load balancers poll the health endpoints at high rates; the root reply
+# never changes, so serialize it once at import instead of per request
+_ROOT_BYTES = orjson.dumps({
+    "status": "healthy",
+    "service": "Investment Research Assistant API",
+    "version": "1.0.0"
+})
+
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
-    return {
-        "status": "healthy",
-        "service": "Investment Research Assistant API",
-        "version": "1.0.0"
-    }
+    return Response(content=_ROOT_BYTES, media_type="application/json")
 
 
 @app.get("/health")
@@ -140,9 +259,16 @@ async def health_check():
 
 if __name__ == "__main__":
     import uvicorn
+
+    # Hot-reload only in development: the watcher-based reloader forces a
+    # single worker and disables the C-accelerated loop/parser
+    is_dev = settings.ENVIRONMENT == "development"
     uvicorn.run(
         "main:app",
         host=settings.API_HOST,
         port=settings.API_PORT,
-        reload=True
+        loop="uvloop" if uvloop is not None else "auto",
+        http="httptools",
+        workers=1 if is_dev else settings.WORKERS,
+        reload=is_dev
     )
@@ -4,23 +4,45 @@ Embedding Service
 Handles generation of embeddings using OpenAI's API.
 Includes batching and error handling for production use.
 """
+import asyncio
+import hashlib
 import logging
 from typing import List, Dict, Any
+import numpy as np
 import openai
 from tenacity import retry, stop_after_attempt, wait_exponential
 from core.config import settings
+from core.http_client import get_http_client, get_async_http_client
 
 logger = logging.getLogger(__name__)
 
 
 class EmbeddingService:
     """Service for generating text embeddings"""
-    
+
     def __init__(self):
         """Initialize the embedding service with OpenAI client"""
-        self.client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
+        # Shared pooled HTTP client: reuses keep-alive connections across
+        # services instead of opening a pool per OpenAI client
+        self.client = openai.OpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            http_client=get_http_client()
+        )
+        self.aclient = openai.AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            http_client=get_async_http_client()
+        )
         self.model = settings.OPENAI_EMBEDDING_MODEL
-        logger.info(f"EmbeddingService initialized with model: {self.model}")
+        # Matryoshka truncation: v3 models accept a dimensions argument that
+        # returns a shorter vector with minimal quality loss
+        self._embed_kwargs = (
+            {"dimensions": settings.EMBEDDING_DIMENSIONS}
+            if settings.EMBEDDING_DIMENSIONS else {}
+        )
+        logger.info(
+            f"EmbeddingService initialized with model: {self.model}"
+            + (f" ({settings.EMBEDDING_DIMENSIONS} dims)" if self._embed_kwargs else "")
+        )
     
     @retry(
         stop=stop_after_attempt(3),
@@ -50,7 +72,8 @@ class EmbeddingService:
             # Call OpenAI API
             response = self.client.embeddings.create(
                 model=self.model,
-                input=text
+                input=text,
+                **self._embed_kwargs
             )
             
             embedding = response.data[0].embedding
@@ -103,7 +126,8 @@ class EmbeddingService:
                 # Call OpenAI API with batch
                 response = self.client.embeddings.create(
                     model=self.model,
-                    input=cleaned_batch
+                    input=cleaned_batch,
+                    **self._embed_kwargs
                 )
                 
                 # Extract embeddings in order
@@ -119,6 +143,198 @@ class EmbeddingService:
         logger.info(f"Successfully generated {len(all_embeddings)} embeddings")
         return all_embeddings
     
+    def generate_embeddings_array(
+        self,
+        texts: List[str],
+        batch_size: int = 100
+    ) -> "np.ndarray":
+        """
+        Generate embeddings as a single float32 matrix
+
+        A 3072-dim embedding as a Python list costs ~86KB of boxed floats;
+        the same vector as a float32 row is 12KB and supports vectorized
+        normalization, quantization, and similarity math. Use this variant
+        when the result feeds NumPy code (e.g. the semantic cache); convert
+        rows to lists only at the Pinecone boundary, which requires plain
+        floats.
+
+        Args:
+            texts: List of texts to embed
+            batch_size: Number of texts to process in each API call
+
+        Returns:
+            Array of shape (len(texts), dimension), dtype float32
+        """
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        out = None
+        filled = 0
+
+        for i in range(0, len(texts), batch_size):
+            batch = texts[i:i + batch_size]
+            cleaned_batch = [text.replace("\n", " ").strip() for text in batch]
+
+            response = self.client.embeddings.create(
+                model=self.model,
+                input=cleaned_batch,
+                **self._embed_kwargs
+            )
+            batch_array = np.asarray(
+                [item.embedding for item in response.data], dtype=np.float32
+            )
+
+            if out is None:
+                # Dimension comes from the first response; preallocate once
+                out = np.empty((len(texts), batch_array.shape[1]), dtype=np.float32)
+            out[filled:filled + len(batch_array)] = batch_array
+            filled += len(batch_array)
+
+        logger.info(f"Generated {filled} embeddings as float32 array")
+        return out
+
+    async def agenerate_embedding(self, text: str) -> List[float]:
+        """
+        Async variant of generate_embedding for use inside async endpoints
+
+        Args:
+            text: Text to embed
+
+        Returns:
+            List of floats representing the embedding vector
+        """
+        text = text.replace("\n", " ").strip()
+
+        if not text:
+            raise ValueError("Cannot generate embedding for empty text")
+
+        response = await self.aclient.embeddings.create(
+            model=self.model,
+            input=text,
+            **self._embed_kwargs
+        )
+        return response.data[0].embedding
+
+    async def agenerate_embeddings_batch(
+        self,
+        texts: List[str],
+        batch_size: int = 100,
+        max_concurrency: int = 8
+    ) -> List[List[float]]:
+        """
+        Generate embeddings for multiple texts with concurrent API calls
+
+        Each OpenAI round-trip is ~100-300ms of pure network wait, so firing
+        batches concurrently collapses wall-clock time to roughly one
+        round-trip regardless of batch count.
+
+        Args:
+            texts: List of texts to embed
+            batch_size: Number of texts per API call
+            max_concurrency: Maximum number of in-flight API calls
+
+        Returns:
+            List of embedding vectors (same order as input texts)
+
+        Raises:
+            Exception: If any batch fails after retries
+        """
+        if not texts:
+            return []
+
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+        logger.info(f"Generating embeddings for {len(texts)} texts in {len(batches)} concurrent batches")
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def embed_batch(batch: List[str]) -> List[List[float]]:
+            cleaned_batch = [text.replace("\n", " ").strip() for text in batch]
+            async with semaphore:
+                response = await self.aclient.embeddings.create(
+                    model=self.model,
+                    input=cleaned_batch,
+                    **self._embed_kwargs
+                )
+            return [item.embedding for item in response.data]
+
+        batch_results = await asyncio.gather(*(embed_batch(batch) for batch in batches))
+
+        all_embeddings = [embedding for batch in batch_results for embedding in batch]
+        logger.info(f"Successfully generated {len(all_embeddings)} embeddings")
+        return all_embeddings
+
+    async def aembed_and_upsert_chunks(
+        self,
+        chunks: List[Any],
+        pinecone_service: Any,
+        namespace: str = "",
+        batch_size: int = 100,
+        queue_size: int = 4,
+        metadata_text_limit: int = 1000
+    ) -> int:
+        """
+        Pipeline embedding and Pinecone upsert instead of running them serially
+
+        Embedding and upserting are both network-bound, so a producer/consumer
+        pipeline overlaps them: as each OpenAI batch returns, its vectors are
+        handed to an upsert task while the next batch is already in flight.
+
+        Args:
+            chunks: DocumentChunk objects (text, metadata, chunk_id)
+            pinecone_service: PineconeService to upsert through
+            namespace: Pinecone namespace to upsert into
+            batch_size: Number of chunks per embedding/upsert batch
+            queue_size: Max embedded batches buffered ahead of the upserter
+            metadata_text_limit: Chars of chunk text stored in vector metadata
+
+        Returns:
+            Number of vectors upserted
+        """
+        if not chunks:
+            return 0
+
+        logger.info(f"Pipelining embed+upsert for {len(chunks)} chunks (batch={batch_size})")
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+        async def producer():
+            for i in range(0, len(chunks), batch_size):
+                batch = chunks[i:i + batch_size]
+                cleaned = [chunk.text.replace("\n", " ").strip() for chunk in batch]
+                response = await self.aclient.embeddings.create(
+                    model=self.model,
+                    input=cleaned,
+                    **self._embed_kwargs
+                )
+                vectors = [
+                    {
+                        'id': chunk.chunk_id,
+                        'values': item.embedding,
+                        'metadata': {
+                            **chunk.metadata,
+                            'text': chunk.text[:metadata_text_limit]
+                        }
+                    }
+                    for chunk, item in zip(batch, response.data)
+                ]
+                await queue.put(vectors)
+            await queue.put(None)  # Sentinel: no more batches
+
+        async def consumer() -> int:
+            upserted = 0
+            while True:
+                vectors = await queue.get()
+                if vectors is None:
+                    return upserted
+                await pinecone_service.aupsert_vectors(
+                    vectors, namespace=namespace, batch_size=batch_size
+                )
+                upserted += len(vectors)
+
+        _, total = await asyncio.gather(producer(), consumer())
+        logger.info(f"Pipelined upsert complete: {total} vectors")
+        return total
+
     def embed_chunks(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         Generate embeddings for a list of document chunks
@@ -130,17 +346,29 @@ class EmbeddingService:
             List of chunks with 'embedding' added to each
         """
         logger.info(f"Embedding {len(chunks)} chunks")
-        
-        # Extract texts
-        texts = [chunk['text'] for chunk in chunks]
-        
-        # Generate embeddings
-        embeddings = self.generate_embeddings_batch(texts)
-        
-        # Add embeddings to chunks
-        for chunk, embedding in zip(chunks, embeddings):
-            chunk['embedding'] = embedding
-        
+
+        # Dedupe identical texts first: filings repeat boilerplate
+        # (disclaimers, footers) verbatim, and each duplicate would pay a
+        # full OpenAI call. Embed each unique text once and scatter back.
+        chunk_hashes = [
+            hashlib.blake2b(chunk['text'].encode(), digest_size=16).digest()
+            for chunk in chunks
+        ]
+        unique_texts: Dict[bytes, str] = {}
+        for chunk, text_hash in zip(chunks, chunk_hashes):
+            unique_texts.setdefault(text_hash, chunk['text'])
+
+        if len(unique_texts) < len(chunks):
+            logger.info(f"Deduplicated {len(chunks)} chunks to {len(unique_texts)} unique texts")
+
+        # Generate embeddings for unique texts only
+        embeddings = self.generate_embeddings_batch(list(unique_texts.values()))
+        embedding_by_hash = dict(zip(unique_texts.keys(), embeddings))
+
+        # Add embeddings to chunks (duplicates share the same vector)
+        for chunk, text_hash in zip(chunks, chunk_hashes):
+            chunk['embedding'] = embedding_by_hash[text_hash]
+
         logger.info("Successfully added embeddings to all chunks")
         return chunks
 
@@ -4,6 +4,7 @@ Pinecone Service
 Handles vector storage and retrieval using Pinecone.
 Manages index creation, upserting vectors, and searching.
 """
+import asyncio
 import logging
 from typing import List, Dict, Any, Optional
 from pinecone import Pinecone, ServerlessSpec
@@ -11,6 +12,14 @@ from core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Optional gRPC transport: much lower per-RPC overhead than REST and supports
+# fire-and-collect parallel upserts (requires the pinecone[grpc] extra)
+try:
+    from pinecone.grpc import PineconeGRPC
+    PINECONE_GRPC_AVAILABLE = True
+except ImportError:
+    PINECONE_GRPC_AVAILABLE = False
+
 
 def get_embedding_dimension(model_name: str) -> int:
     """
@@ -21,10 +30,15 @@ def get_embedding_dimension(model_name: str) -> int:
         
     Returns:
         Dimension of the embedding vectors
-        
+
     Raises:
         ValueError: If model name is not recognized
     """
+    # Explicit override wins: v3 models can be Matryoshka-truncated via the
+    # dimensions argument, and the index must be created to match
+    if settings.EMBEDDING_DIMENSIONS:
+        return settings.EMBEDDING_DIMENSIONS
+
     model_dimensions = {
         "text-embedding-3-large": 3072,
         "text-embedding-3-small": 1536,
@@ -46,11 +60,21 @@ class PineconeService:
     
     def __init__(self):
         """Initialize Pinecone client and connect to index"""
-        self.client = Pinecone(api_key=settings.PINECONE_API_KEY)
+        self.use_grpc = PINECONE_GRPC_AVAILABLE and settings.PINECONE_USE_GRPC
+        if settings.PINECONE_USE_GRPC and not PINECONE_GRPC_AVAILABLE:
+            logger.warning("PINECONE_USE_GRPC is set but pinecone[grpc] is not installed - using REST")
+
+        if self.use_grpc:
+            self.client = PineconeGRPC(api_key=settings.PINECONE_API_KEY)
+        else:
+            self.client = Pinecone(api_key=settings.PINECONE_API_KEY)
         self.index_name = settings.PINECONE_INDEX_NAME
         self.index = None
-        
-        logger.info(f"PineconeService initialized for index: {self.index_name}")
+
+        logger.info(
+            f"PineconeService initialized for index: {self.index_name} "
+            f"({'gRPC' if self.use_grpc else 'REST'} transport)"
+        )
     
     def create_index_if_not_exists(
         self, 
@@ -70,39 +94,27 @@ class PineconeService:
         if dimension is None:
             dimension = get_embedding_dimension(settings.OPENAI_EMBEDDING_MODEL)
             logger.info(f"Auto-detected dimension {dimension} for model {settings.OPENAI_EMBEDDING_MODEL}")
-        
-        existing_indexes = [index.name for index in self.client.list_indexes()]
-        
-        if self.index_name in existing_indexes:
+
+        # One control-plane round-trip; the old flow re-listed up to three times
+        index_exists = self.index_name in self._list_index_names()
+
+        if index_exists:
             # Check if existing index has correct dimensions
             existing_index = self.client.describe_index(self.index_name)
             existing_dimension = existing_index.dimension
-            
+
             if existing_dimension != dimension:
                 logger.warning(
                     f"Index {self.index_name} exists with dimension {existing_dimension}, "
                     f"but need {dimension} for model {settings.OPENAI_EMBEDDING_MODEL}"
                 )
-                
+
                 if force_recreate:
                     logger.info(f"Deleting existing index {self.index_name} to recreate with correct dimensions...")
                     self.client.delete_index(self.index_name)
                     logger.info(f"Deleted index {self.index_name}")
-                    
-                    # Wait for index deletion to complete and verify it's gone
-                    import time
-                    max_wait = 30  # seconds
-                    wait_time = 0
-                    while wait_time < max_wait:
-                        existing_indexes = [index.name for index in self.client.list_indexes()]
-                        if self.index_name not in existing_indexes:
-                            logger.info(f"Index deletion confirmed after {wait_time}s")
-                            break
-                        time.sleep(2)
-                        wait_time += 2
-                    
-                    if wait_time >= max_wait:
-                        logger.warning(f"Index deletion taking longer than expected, proceeding anyway...")
+                    self._wait_for_index_deletion()
+                    index_exists = False
                 else:
                     raise ValueError(
                         f"Index {self.index_name} has dimension {existing_dimension} but "
@@ -111,12 +123,10 @@ class PineconeService:
                     )
             else:
                 logger.info(f"Index {self.index_name} already exists with correct dimension {dimension}")
-        
-        # Only create index if it doesn't exist (after potential deletion)
-        existing_indexes = [index.name for index in self.client.list_indexes()]
-        if self.index_name not in existing_indexes:
+
+        if not index_exists:
             logger.info(f"Creating new index: {self.index_name} with dimension {dimension}")
-            
+
             self.client.create_index(
                 name=self.index_name,
                 dimension=dimension,
@@ -126,29 +136,59 @@ class PineconeService:
                     region=settings.PINECONE_ENVIRONMENT
                 )
             )
-            
+
             logger.info(f"Index {self.index_name} created successfully")
-            
-            # Wait for index to be ready
-            import time
-            max_wait = 60  # seconds
-            wait_time = 0
-            while wait_time < max_wait:
-                try:
-                    # Try to connect to the index
-                    test_index = self.client.Index(self.index_name)
-                    stats = test_index.describe_index_stats()
-                    logger.info(f"Index is ready after {wait_time}s")
-                    break
-                except Exception:
-                    time.sleep(2)
-                    wait_time += 2
-            
-            if wait_time >= max_wait:
-                logger.warning(f"Index creation taking longer than expected, proceeding anyway...")
-        
-        # Connect to index
-        self.index = self.client.Index(self.index_name)
+            self._wait_for_index_ready()
+
+        # Connect to index. For REST, size the HTTP client's pool so the
+        # concurrent hybrid-search arms and batch fan-out don't queue
+        # behind a single connection; the gRPC transport already
+        # multiplexes streams over one channel.
+        if self.use_grpc:
+            self.index = self.client.Index(self.index_name)
+        else:
+            self.index = self.client.Index(self.index_name, pool_threads=8)
+
+    async def acreate_index_if_not_exists(self, **kwargs):
+        """
+        Async wrapper around create_index_if_not_exists
+
+        The control-plane calls and the ready/deletion polling all block, so
+        they run in a worker thread and never stall the event loop.
+        """
+        await asyncio.to_thread(self.create_index_if_not_exists, **kwargs)
+
+    def _list_index_names(self) -> set:
+        """Fetch the existing index names in a single control-plane call"""
+        return {index.name for index in self.client.list_indexes()}
+
+    def _wait_for_index_deletion(self, max_wait: int = 30, poll_interval: int = 2):
+        """Poll until the index disappears from the listing (best-effort)"""
+        import time
+        waited = 0
+        while waited < max_wait:
+            if self.index_name not in self._list_index_names():
+                logger.info(f"Index deletion confirmed after {waited}s")
+                return
+            time.sleep(poll_interval)
+            waited += poll_interval
+        logger.warning("Index deletion taking longer than expected, proceeding anyway...")
+
+    def _wait_for_index_ready(self, max_wait: int = 60, poll_interval: int = 2):
+        """Poll the index status flag until it reports ready (best-effort)"""
+        import time
+        waited = 0
+        while waited < max_wait:
+            try:
+                status = self.client.describe_index(self.index_name).status
+                if status and status.get('ready'):
+                    logger.info(f"Index is ready after {waited}s")
+                    return
+            except Exception:
+                pass  # Not visible yet - keep polling
+            time.sleep(poll_interval)
+            waited += poll_interval
+        logger.warning("Index creation taking longer than expected, proceeding anyway...")
     
     def upsert_vectors(
         self, 
@@ -168,25 +208,84 @@ class PineconeService:
             self.create_index_if_not_exists()
         
         logger.info(f"Upserting {len(vectors)} vectors to index {self.index_name}")
-        
-        # Process in batches
+
+        if self.use_grpc:
+            self._upsert_parallel_grpc(vectors, namespace, batch_size)
+        else:
+            # Process in batches
+            for i in range(0, len(vectors), batch_size):
+                batch = vectors[i:i + batch_size]
+
+                try:
+                    self.index.upsert(
+                        vectors=batch,
+                        namespace=namespace
+                    )
+
+                    logger.info(f"Upserted batch {i//batch_size + 1}/{(len(vectors)-1)//batch_size + 1}")
+
+                except Exception as e:
+                    logger.error(f"Error upserting batch {i//batch_size + 1}: {str(e)}")
+                    raise
+
+        logger.info(f"Successfully upserted all {len(vectors)} vectors")
+
+    def _upsert_parallel_grpc(
+        self,
+        vectors: List[Dict[str, Any]],
+        namespace: str,
+        batch_size: int,
+        parallelism: int = 16
+    ):
+        """
+        Upsert batches over gRPC with up to `parallelism` RPCs in flight
+
+        async_req=True returns a future per batch, so batches upload
+        concurrently instead of paying one round-trip each in sequence.
+        """
+        in_flight = []
         for i in range(0, len(vectors), batch_size):
             batch = vectors[i:i + batch_size]
-            
+            in_flight.append(
+                (i // batch_size + 1, self.index.upsert(vectors=batch, namespace=namespace, async_req=True))
+            )
+            if len(in_flight) >= parallelism:
+                self._drain_upsert_futures(in_flight)
+
+        self._drain_upsert_futures(in_flight)
+
+    @staticmethod
+    def _drain_upsert_futures(in_flight: List[Any]):
+        """Wait for all pending upsert futures, surfacing the first failure"""
+        for batch_num, future in in_flight:
             try:
-                self.index.upsert(
-                    vectors=batch,
-                    namespace=namespace
-                )
-                
-                logger.info(f"Upserted batch {i//batch_size + 1}/{(len(vectors)-1)//batch_size + 1}")
-                
+                future.result()
             except Exception as e:
-                logger.error(f"Error upserting batch {i//batch_size + 1}: {str(e)}")
+                logger.error(f"Error upserting batch {batch_num}: {str(e)}")
                 raise
-        
-        logger.info(f"Successfully upserted all {len(vectors)} vectors")
-    
+        in_flight.clear()
+
+    async def aupsert_vectors(
+        self,
+        vectors: List[Dict[str, Any]],
+        namespace: str = "",
+        batch_size: int = 100
+    ):
+        """
+        Async wrapper around upsert_vectors for use in ingest pipelines
+
+        The blocking upsert runs in a worker thread so the event loop stays
+        free to drive concurrent embedding calls while vectors upload.
+
+        Args:
+            vectors: List of dicts with 'id', 'values', and 'metadata' keys
+            namespace: Optional namespace for organizing vectors
+            batch_size: Number of vectors per batch
+        """
+        await asyncio.to_thread(
+            self.upsert_vectors, vectors, namespace=namespace, batch_size=batch_size
+        )
+
     def search(
         self,
         query_vector: List[float],
@@ -235,6 +334,42 @@ class PineconeService:
             logger.error(f"Error searching vectors: {str(e)}")
             raise
     
+    def list_document_names(self, namespace: str = "") -> set:
+        """
+        Enumerate unique document names stored in the index.
+
+        Uses the index ID listing rather than a similarity query: vector IDs
+        follow the "<document_name>::chunk_<n>" convention (see
+        scripts/setup_demo_data.py), so paging through IDs is enough to
+        recover every document - no embeddings or metadata cross the wire,
+        and documents can't be missed the way a top_k probe query could
+        miss them.
+
+        Args:
+            namespace: Namespace to enumerate
+
+        Returns:
+            Set of unique document names
+        """
+        if not self.index:
+            self.create_index_if_not_exists()
+
+        names = set()
+
+        try:
+            for id_page in self.index.list(namespace=namespace):
+                for vector_id in id_page:
+                    # IDs without the separator are not chunk vectors; skip them
+                    if '::' in vector_id:
+                        names.add(vector_id.split('::', 1)[0])
+
+            logger.info(f"Listed {len(names)} unique documents from index IDs")
+            return names
+
+        except Exception as e:
+            logger.error(f"Error listing document names: {str(e)}")
+            raise
+
     def delete_all(self, namespace: str = ""):
         """
         Delete all vectors in a namespace (use with caution!)
@@ -5,12 +5,24 @@ Retrieval-Augmented Generation pipeline for answering questions
 using document context from Pinecone vector store.
 Supports hybrid search (semantic + keyword) and Cohere reranking.
 """
+import asyncio
+import hashlib
+import heapq
+import json
 import logging
+import os
 import re
-from typing import List, Dict, Any, Optional, Tuple, Set
-from openai import OpenAI
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from operator import itemgetter
+from typing import Iterator, List, Dict, Any, Optional, Tuple, Set
+from openai import OpenAI, AsyncOpenAI
 from core.config import settings
+from core.http_client import get_http_client, get_async_http_client
 from core.security import harden_prompt, sanitize_for_prompt
+from core.semantic_cache import SemanticQueryCache
 from services.embedding_service import EmbeddingService
 from services.pinecone_service import PineconeService
 
@@ -24,12 +36,182 @@ except ImportError:
     COHERE_AVAILABLE = False
     logger.warning("Cohere not available. Reranking will be disabled.")
 
+# Optional pyahocorasick import for single-pass keyword matching
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+    logger.warning("pyahocorasick not available. Keyword scoring will use substring scans.")
+
+# Optional tiktoken import for token-budgeted context packing
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+    logger.warning("tiktoken not available. Context will use char truncation.")
+
 # Import query analysis types
 try:
     from core.security import QueryAnalysisResult
 except ImportError:
     QueryAnalysisResult = None
 
+# Optional Redis tier for the exact-match answer cache. The in-process
+# OrderedDict is per worker and lost on every reload, so with WORKERS > 1
+# each process warms its own cache from scratch. When REDIS_URL is set
+# (same variable the cost tracker and rate limiter use), answers are
+# written through to Redis with a TTL and misses check Redis before
+# recomputing: all workers share repeat-query hits and restarts start
+# warm. Without Redis the in-process layer works exactly as before.
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+REDIS_URL = os.getenv("REDIS_URL", "")
+
+_answer_redis = None
+if REDIS_URL and REDIS_AVAILABLE:
+    try:
+        _answer_redis = redis.Redis.from_url(REDIS_URL, socket_timeout=1.0)
+        _answer_redis.ping()
+        logger.info("Answer cache using shared Redis tier")
+    except Exception as e:
+        logger.warning(f"Could not connect to Redis, answer cache is in-process only: {e}")
+        _answer_redis = None
+elif REDIS_URL and not REDIS_AVAILABLE:
+    logger.warning("REDIS_URL is set but the redis package is not installed, answer cache is in-process only")
+
+# Redis answer entries expire on their own (no sweeper needed); an hour
+# balances repeat-traffic hits against serving stale answers after
+# document re-ingestion
+ANSWER_CACHE_REDIS_TTL = 3600
+_ANSWER_REDIS_PREFIX = "answer:"
+
+# Maximum number of answers held by the in-process response cache
+ANSWER_CACHE_MAXSIZE = 1024
+
+# Cosine similarity above which two queries count as the same question.
+# 0.93 is tighter than the generic cache default: paraphrases hit, but
+# "Apple's revenue" vs "Apple's net income" stay distinct.
+SEMANTIC_CACHE_THRESHOLD = 0.93
+
+# Maximum number of query embeddings held by the content-addressed cache
+EMBEDDING_CACHE_MAXSIZE = 2048
+
+# Maximum number of lowercased chunk texts memoized for keyword scoring
+LOWER_CACHE_MAXSIZE = 4096
+
+# LLM pricing in integer microdollars per token, keyed by model-name prefix
+# (first match wins via iteration order). Resolved once at service init.
+# Cost math stays in ints until the return boundary so repeated additions
+# can't accumulate float rounding error in $-tracking.
+_MODEL_PRICING_MICRO = {
+    "gpt-4-turbo": (10, 30),  # $0.01/$0.03 per 1K tokens
+    "gpt-4": (30, 60),
+}
+_DEFAULT_PRICING_MICRO = (10, 30)
+
+# text-embedding-3-large: $0.00013 per 1K tokens = 13 microdollars per 100
+EMBEDDING_MICRO_PER_100_TOKENS = 13
+
+# Rough per-result Pinecone query cost estimate ($0.0001)
+PINECONE_MICRO_PER_RESULT = 100
+
+# Cohere rerank: $1.00 per 1,000 requests, i.e. $0.001 per call (2024)
+RERANK_MICRO_PER_CALL = 1000
+
+MICRO_PER_USD = 1_000_000
+
+# Keyword extraction constants, hoisted so per-query work is one compiled
+# findall plus a set comprehension against a frozen stopword set
+_WORD_RE = re.compile(r'\b[a-zA-Z0-9]+\b')
+
+# Single-pass lowercase-and-split table for ASCII queries: alphanumerics
+# fold to lowercase, everything else becomes a space, so one translate +
+# split replaces the lower() pass plus the regex scan. Tokenizes the same
+# as _WORD_RE for ASCII input (and, unlike \b, doesn't swallow words glued
+# to underscores); non-ASCII queries keep the regex.
+_ASCII_FOLD = str.maketrans({
+    chr(c): (chr(c).lower() if chr(c).isalnum() else ' ')
+    for c in range(128)
+})
+
+_STOPWORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+    'of', 'with', 'by', 'from', 'as', 'is', 'was', 'are', 'were', 'be',
+    'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will',
+    'would', 'should', 'could', 'may', 'might', 'must', 'can', 'what',
+    'which', 'who', 'where', 'when', 'why', 'how', 'this', 'that',
+    'these', 'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they'
+})
+
+# Drop semantic candidates scoring below this before merge/rerank. Matches
+# the lowest relevance tier the API layer surfaces (0.10): anything under
+# it is discarded downstream anyway, so carrying it through the RRF merge
+# and into the Cohere rerank payload is pure waste. Kept well below the
+# typical 0.3-0.5 cosine range of real matches so recall is untouched.
+SEMANTIC_MIN_SCORE = 0.10
+
+# Reciprocal Rank Fusion constant: each list contributes 1/(k + rank) per
+# result. 60 is the standard choice - small enough that top ranks dominate,
+# large enough that a single list can't drown out the other.
+RRF_K = 60
+
+# Shared pool for overlapping the independent network round-trips inside a
+# single hybrid search (keyword embedding + two Pinecone queries). Module
+# level so concurrent requests share threads instead of spawning pools.
+_SEARCH_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hybrid-search")
+
+# How long a coalesced duplicate request waits for the in-flight leader
+# before giving up and running the pipeline itself
+INFLIGHT_WAIT_SECONDS = 60.0
+
+# System prompt template pieces, hoisted so per-request work is at most
+# two small concatenations (harden_prompt caches the assembled variants)
+_SYSTEM_PROMPT_BASE = """You are an expert financial research assistant. Answer questions based ONLY on the provided document context. 
+Be precise and cite specific sources. If the context doesn't contain enough information, say so clearly.
+
+Format your response professionally and include references to the source documents when making claims."""
+
+_MULTI_PART_ADDENDUM = """
+
+IMPORTANT: This query contains multiple parts ({count} parts detected). 
+- Address ALL aspects of the question comprehensively
+- Organize your response to clearly cover each part
+- Use clear structure (e.g., numbered points or sections) if multiple distinct questions are present
+- Ensure each part of the question receives adequate attention"""
+
+_COMPARISON_ADDENDUM = "\n- This appears to be a comparison question. Provide a clear side-by-side comparison with specific details from the documents."
+
+
+def _extract(chunks: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """
+    Pre-extract each chunk's metadata dict in one pass.
+
+    The per-chunk loops below read several metadata fields each; binding
+    the metadata dict once per chunk replaces repeated
+    chunk.get('metadata', {}) chains (a lookup plus a fresh default-dict
+    allocation every call), which matters at rerank-sized top_k.
+    """
+    return [(chunk.get('metadata') or {}, chunk) for chunk in chunks]
+
+
+@lru_cache(maxsize=8)
+def _system_message(content: str) -> Dict[str, str]:
+    """
+    Return the chat-completions system message for a system prompt.
+
+    The system prompt only takes a handful of values (plain / multi-part
+    by count / comparison), so the message dict is interned per variant
+    and each request builds only the user half. The SDK never mutates
+    messages, so sharing the dict across calls is safe.
+    """
+    return {"role": "system", "content": content}
+
 
 class RAGService:
     """Service for RAG-based question answering"""
@@ -38,24 +220,227 @@ class RAGService:
         """Initialize RAG service with embedding and Pinecone services"""
         self.embedding_service = EmbeddingService()
         self.pinecone_service = PineconeService()
-        self.llm_client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        self.llm_client = OpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            http_client=get_http_client()
+        )
+        # Async client for the aquery/aquery_batch paths; shares the pooled
+        # async HTTP client so concurrent requests reuse connections
+        self.allm_client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            http_client=get_async_http_client()
+        )
         self.llm_model = settings.OPENAI_MODEL
-        
+
+        # Tokenizer for packing context to a global token budget instead of
+        # a fixed char cap per chunk. encoding_for_model may fetch the BPE
+        # table on first use, so failure falls back to char truncation.
+        self._enc = None
+        self.context_token_budget = settings.CONTEXT_TOKEN_BUDGET
+        if TIKTOKEN_AVAILABLE and self.context_token_budget > 0:
+            try:
+                try:
+                    self._enc = tiktoken.encoding_for_model(self.llm_model)
+                except KeyError:
+                    self._enc = tiktoken.get_encoding("cl100k_base")
+                logger.info(f"Context packing to {self.context_token_budget} token budget")
+            except Exception as e:
+                logger.warning(f"Could not load tokenizer ({e}); using char truncation")
+                self._enc = None
+
+        # Candidate pool width for reranking (top_k * multiplier retrieved,
+        # reranked, top_k kept)
+        self.rerank_multiplier = max(1, settings.RERANK_CANDIDATE_MULTIPLIER)
+
+        # Resolve token pricing once (prefix match on the model name)
+        self._input_micro, self._output_micro = next(
+            (price for prefix, price in _MODEL_PRICING_MICRO.items()
+             if self.llm_model.startswith(prefix)),
+            _DEFAULT_PRICING_MICRO
+        )
+
         # Initialize Cohere client if API key is available
         self.cohere_client = None
         if COHERE_AVAILABLE and settings.COHERE_API_KEY:
             try:
-                self.cohere_client = cohere.Client(api_key=settings.COHERE_API_KEY)
+                # Share the pooled HTTP client so rerank calls reuse warm
+                # keep-alive connections like the OpenAI clients do
+                self.cohere_client = cohere.Client(
+                    api_key=settings.COHERE_API_KEY,
+                    httpx_client=get_http_client()
+                )
                 logger.info("Cohere reranking enabled")
             except Exception as e:
                 logger.warning(f"Failed to initialize Cohere client: {e}")
                 self.cohere_client = None
         
+        # Exact-match answer cache: a repeated (query, top_k, filter)
+        # combination returns the stored result with a dict lookup instead
+        # of re-running the multi-second embedding + Pinecone + LLM pipeline.
+        # Guarded by a lock because query() runs on worker threads.
+        self._answer_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._answer_cache_lock = threading.Lock()
+
+        # Semantic cache layer: catches paraphrases of recently answered
+        # questions ("What is Apple's revenue?" vs "How much revenue did
+        # Apple make?") by cosine similarity against the query embedding
+        # that query() computes anyway. A hit skips Pinecone and the LLM.
+        self._semantic_cache = SemanticQueryCache(
+            similarity_threshold=SEMANTIC_CACHE_THRESHOLD
+        )
+
+        # Content-addressed embedding cache: the same query string embedded
+        # twice (common in FAQ-style traffic, and every hybrid search embeds
+        # both the query and its keyword bag) costs a ~100-500ms network
+        # round trip each time. Keyed on hash(model | text) so a model swap
+        # invalidates naturally.
+        self._embedding_cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._embedding_cache_lock = threading.Lock()
+
+        # Lowercased chunk texts for keyword scoring, keyed by chunk id:
+        # popular chunks surface query after query, and str.lower()
+        # reallocates the full chunk text every time otherwise
+        self._lower_cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lower_cache_lock = threading.Lock()
+
+        # Singleflight (stampede protection): when identical requests burst
+        # in before the first finishes, followers wait on the leader's event
+        # and read its freshly cached result instead of firing duplicate LLM
+        # calls. Sync and async paths keep separate maps because a
+        # threading.Event wait would block the event loop.
+        self._inflight: Dict[str, threading.Event] = {}
+        self._inflight_lock = threading.Lock()
+        self._ainflight: Dict[str, asyncio.Event] = {}
+
         # Ensure Pinecone index exists
         self.pinecone_service.create_index_if_not_exists()
         
         logger.info(f"RAGService initialized with model: {self.llm_model}")
     
+    def _answer_cache_key(
+        self,
+        query: str,
+        top_k: int,
+        use_reranking: bool,
+        filter_dict: Optional[Dict[str, Any]]
+    ) -> str:
+        """
+        Build a deterministic cache key for a query + retrieval configuration.
+
+        The model name is included so a config change (e.g. swapping
+        OPENAI_MODEL) never serves answers generated by a different model.
+
+        Args:
+            query: User's question (already sanitized by the caller)
+            top_k: Number of chunks requested
+            use_reranking: Whether reranking was requested
+            filter_dict: Optional metadata filters
+
+        Returns:
+            Hex digest usable as a dict key
+        """
+        payload = json.dumps(
+            [query, top_k, use_reranking, self.llm_model, filter_dict],
+            sort_keys=True
+        )
+        return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+    def _embed_cached(self, text: str) -> List[float]:
+        """
+        Generate an embedding, serving repeats from a content-addressed cache.
+
+        The key is blake2b over "model|text", so identical text embedded
+        under a different model never collides. Cache hits replace a
+        network round trip with a dict lookup; hashing a short query is
+        sub-microsecond by comparison.
+
+        Args:
+            text: Text to embed
+
+        Returns:
+            Embedding vector for the text
+        """
+        key = hashlib.blake2b(
+            f"{self.embedding_service.model}|{text}".encode(),
+            digest_size=16
+        ).hexdigest()
+
+        with self._embedding_cache_lock:
+            embedding = self._embedding_cache.get(key)
+            if embedding is not None:
+                self._embedding_cache.move_to_end(key)
+                logger.debug("Embedding cache hit")
+                return embedding
+
+        embedding = self.embedding_service.generate_embedding(text)
+
+        with self._embedding_cache_lock:
+            self._embedding_cache[key] = embedding
+            self._embedding_cache.move_to_end(key)
+            while len(self._embedding_cache) > EMBEDDING_CACHE_MAXSIZE:
+                self._embedding_cache.popitem(last=False)
+
+        return embedding
+
+    def _embed_many_cached(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed several texts, fetching all cache misses in one batched call.
+
+        Same content-addressed cache as _embed_cached, but misses go
+        through generate_embeddings_batch so N cold texts cost one OpenAI
+        round trip instead of N. The hybrid search path uses this to fetch
+        the query and keyword vectors together.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            One embedding vector per text, in input order
+        """
+        keys = [
+            hashlib.blake2b(
+                f"{self.embedding_service.model}|{text}".encode(),
+                digest_size=16
+            ).hexdigest()
+            for text in texts
+        ]
+
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        with self._embedding_cache_lock:
+            for i, key in enumerate(keys):
+                cached = self._embedding_cache.get(key)
+                if cached is not None:
+                    self._embedding_cache.move_to_end(key)
+                    embeddings[i] = cached
+
+        miss_indices = [i for i, e in enumerate(embeddings) if e is None]
+        if miss_indices:
+            fetched = self.embedding_service.generate_embeddings_batch(
+                [texts[i] for i in miss_indices]
+            )
+            with self._embedding_cache_lock:
+                for i, embedding in zip(miss_indices, fetched):
+                    embeddings[i] = embedding
+                    self._embedding_cache[keys[i]] = embedding
+                    self._embedding_cache.move_to_end(keys[i])
+                while len(self._embedding_cache) > EMBEDDING_CACHE_MAXSIZE:
+                    self._embedding_cache.popitem(last=False)
+
+        return embeddings
+
+    @staticmethod
+    def _cache_params(
+        top_k: int,
+        use_reranking: bool,
+        filter_dict: Optional[Dict[str, Any]]
+    ) -> Tuple:
+        """Request parameters that must match for a semantic cache hit"""
+        return (
+            top_k,
+            use_reranking,
+            json.dumps(filter_dict, sort_keys=True) if filter_dict else None
+        )
+
     def _extract_keywords(self, query: str) -> Set[str]:
         """
         Extract meaningful keywords from query for keyword search.
@@ -67,53 +452,92 @@ class RAGService:
         Returns:
             Set of keywords (lowercased, non-stopwords)
         """
-        # Common stopwords to filter out
-        stopwords = {
-            'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
-            'of', 'with', 'by', 'from', 'as', 'is', 'was', 'are', 'were', 'be',
-            'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will',
-            'would', 'should', 'could', 'may', 'might', 'must', 'can', 'what',
-            'which', 'who', 'where', 'when', 'why', 'how', 'this', 'that',
-            'these', 'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they'
-        }
-        
-        # Extract words (alphanumeric, case-insensitive)
-        words = re.findall(r'\b[a-zA-Z0-9]+\b', query.lower())
-        
+        # Extract words (alphanumeric, case-insensitive). ASCII queries —
+        # the overwhelming majority — take a single C-level translate +
+        # split instead of lower() plus a regex scan; non-ASCII input keeps
+        # the regex so tokenization around accented characters is unchanged.
+        if query.isascii():
+            words = query.translate(_ASCII_FOLD).split()
+        else:
+            words = _WORD_RE.findall(query.lower())
+
         # Filter out stopwords and very short words
-        keywords = {w for w in words if len(w) > 2 and w not in stopwords}
+        keywords = {w for w in words if len(w) > 2 and w not in _STOPWORDS}
         
         logger.debug(f"Extracted keywords from '{query}': {keywords}")
         return keywords
     
+    def _lower_text(self, chunk_id: str, metadata: Dict[str, Any]) -> str:
+        """
+        Return the chunk text lowercased, memoized per chunk id.
+
+        Chunk text is immutable once indexed, and popular chunks come back
+        query after query; caching the lowercased form saves a full-text
+        string allocation per scored result. Reads a pre-lowered
+        'text_lower' metadata field first should ingestion ever store one.
+
+        Args:
+            chunk_id: Pinecone chunk id (cache key)
+            metadata: Chunk metadata containing 'text'
+
+        Returns:
+            Lowercased chunk text
+        """
+        lowered = metadata.get('text_lower')
+        if lowered is not None:
+            return lowered
+
+        if chunk_id:
+            with self._lower_cache_lock:
+                lowered = self._lower_cache.get(chunk_id)
+                if lowered is not None:
+                    self._lower_cache.move_to_end(chunk_id)
+                    return lowered
+
+        lowered = metadata.get('text', '').lower()
+
+        if chunk_id:
+            with self._lower_cache_lock:
+                self._lower_cache[chunk_id] = lowered
+                self._lower_cache.move_to_end(chunk_id)
+                while len(self._lower_cache) > LOWER_CACHE_MAXSIZE:
+                    self._lower_cache.popitem(last=False)
+
+        return lowered
+
     def _keyword_search(
         self,
         keywords: Set[str],
         top_k: int = 5,
-        filter_dict: Optional[Dict[str, Any]] = None
+        filter_dict: Optional[Dict[str, Any]] = None,
+        query_embedding: Optional[List[float]] = None
     ) -> List[Dict[str, Any]]:
         """
         Keyword search using Pinecone metadata filtering.
         Searches for chunks containing any of the keywords in their text.
-        
+
         Args:
             keywords: Set of keywords to search for
             top_k: Number of results to return
             filter_dict: Optional additional metadata filters
-            
+            query_embedding: Precomputed embedding of the keyword string.
+                Pass it when the caller already embedded the keywords (the
+                hybrid path does, concurrently with the semantic search)
+
         Returns:
             List of relevant chunks with metadata
         """
         if not keywords:
             return []
-        
+
         # Note: Pinecone metadata filtering works best with exact matches.
         # For flexible keyword matching, we'll do semantic search on a keyword-embedded query
         # and combine results. This is lightweight and uses existing infrastructure.
-        
+
         # Create a query from keywords for semantic search
-        keyword_query = " ".join(keywords)
-        query_embedding = self.embedding_service.generate_embedding(keyword_query)
+        if query_embedding is None:
+            keyword_query = " ".join(keywords)
+            query_embedding = self._embed_cached(keyword_query)
         
         # Search using semantic similarity on keyword query
         results = self.pinecone_service.search(
@@ -122,29 +546,49 @@ class RAGService:
             filter_dict=filter_dict
         )
         
+        # One multi-pattern automaton scans each chunk text in a single
+        # pass, instead of one substring scan per keyword per chunk
+        automaton = None
+        if AHOCORASICK_AVAILABLE:
+            automaton = ahocorasick.Automaton()
+            for keyword in keywords:
+                automaton.add_word(keyword, keyword)
+            automaton.make_automaton()
+
         # Score results based on keyword presence in text
         keyword_results = []
         for result in results:
             metadata = result.get('metadata', {})
-            text = metadata.get('text', '').lower()
-            
-            # Count keyword matches
-            matches = sum(1 for keyword in keywords if keyword in text)
-            matched_keywords_found = [kw for kw in keywords if kw in text]
+            text = self._lower_text(result.get('id', ''), metadata)
+
+            # Distinct keywords found in the text (same substring
+            # semantics as 'keyword in text' either way)
+            if automaton is not None:
+                matched = {value for _, value in automaton.iter(text)}
+            else:
+                matched = {keyword for keyword in keywords if keyword in text}
+            matches = len(matched)
             if matches > 0:
-                # Boost score based on keyword matches
-                keyword_score = result.get('score', 0.0) + (matches * 0.1)
-                result_copy = result.copy()
-                result_copy['score'] = keyword_score
-                result_copy['keyword_matches'] = matches
-                result_copy['matched_keywords'] = matched_keywords_found
-                keyword_results.append(result_copy)
-        
-        # Sort by keyword score and take top_k
-        keyword_results.sort(key=lambda x: x.get('score', 0.0), reverse=True)
-        keyword_results = keyword_results[:top_k]
+                # Annotate in place: these dicts are freshly built per
+                # call by pinecone_service.search, so no caller shares them
+                result['keyword_matches'] = matches
+                result['matched_keywords'] = sorted(matched)
+                keyword_results.append(result)
+
+        # Rank by match count, then similarity. The score itself stays the
+        # raw similarity - rank fusion in search() only needs the ordering,
+        # and downstream relevance thresholds read score as a similarity.
+        # nlargest keeps a top_k-sized heap instead of sorting all 2*top_k
+        # candidates
+        # Every entry has both keys (set above / by pinecone_service), so
+        # itemgetter works and skips a Python-level lambda frame per element
+        keyword_results = heapq.nlargest(
+            top_k,
+            keyword_results,
+            key=itemgetter('keyword_matches', 'score')
+        )
         
-        logger.info(f"Keyword search found {len(keyword_results)} results with keyword matches")
+        logger.info("Keyword search found %d results with keyword matches", len(keyword_results))
         return keyword_results
     
     def search(
@@ -152,25 +596,31 @@ class RAGService:
         query: str,
         top_k: int = 5,
         filter_dict: Optional[Dict[str, Any]] = None,
-        use_hybrid: bool = True
+        use_hybrid: bool = True,
+        query_embedding: Optional[List[float]] = None
     ) -> List[Dict[str, Any]]:
         """
         Hybrid search: combines semantic and keyword search results.
-        
+
         Args:
             query: User's question
             top_k: Number of results to return
             filter_dict: Optional metadata filters
             use_hybrid: Whether to use hybrid search (default: True)
-            
+            query_embedding: Precomputed embedding for the query. Pass it
+                when the caller already embedded the query (e.g. for a
+                cache probe) to avoid a second embedding API call.
+
         Returns:
             List of relevant chunks with metadata, including search_method
         """
-        logger.info(f"Searching for: '{query}' (top_k={top_k}, hybrid={use_hybrid})")
-        
+        logger.info("Searching for: '%s' (top_k=%d, hybrid=%s)", query, top_k, use_hybrid)
+
+        if not use_hybrid and query_embedding is None:
+            query_embedding = self._embed_cached(query)
+
         if not use_hybrid:
             # Pure semantic search (original behavior)
-            query_embedding = self.embedding_service.generate_embedding(query)
             results = self.pinecone_service.search(
                 query_vector=query_embedding,
                 top_k=top_k,
@@ -184,81 +634,223 @@ class RAGService:
             logger.info(f"Found {len(results)} semantic search results")
             return results
         
-        # Hybrid search: combine semantic + keyword
-        
-        # 1. Semantic search
-        query_embedding = self.embedding_service.generate_embedding(query)
-        semantic_results = self.pinecone_service.search(
+        # Hybrid search: combine semantic + keyword. The two arms are
+        # independent network round-trips, so they run concurrently on the
+        # module pool: the semantic Pinecone query overlaps the keyword
+        # embedding + keyword Pinecone query instead of following them.
+        keywords = self._extract_keywords(query)
+
+        # Keyword-poor queries ("What is revenue?" leaves one token; pure
+        # numbers rarely improve recall): the keyword arm would cost an
+        # embedding plus a Pinecone query to rediscover what the semantic
+        # arm already finds, so fall back to pure semantic retrieval
+        if len(keywords) < 2 or all(word.isdigit() for word in keywords):
+            return self.search(
+                query,
+                top_k=top_k,
+                filter_dict=filter_dict,
+                use_hybrid=False,
+                query_embedding=query_embedding
+            )
+
+        # Sorted join: deterministic text for the embedding cache key
+        # (set iteration order would thrash it) and for the comparison below
+        keyword_query = " ".join(sorted(keywords)) if keywords else None
+
+        # Short queries often survive keyword extraction whole ("Apple
+        # revenue" -> {apple, revenue}); when the keyword bag is just the
+        # query's own words, the query vector stands in for the keyword
+        # vector and the second embedding is skipped entirely
+        keywords_are_query = (
+            keyword_query is not None
+            and keyword_query == " ".join(sorted(set(_WORD_RE.findall(query.lower()))))
+        )
+
+        # When the caller didn't precompute the query vector, fetch both
+        # vectors in one batched OpenAI call instead of two serial requests
+        keyword_embedding = None
+        if query_embedding is None:
+            if keyword_query is not None and not keywords_are_query:
+                query_embedding, keyword_embedding = self._embed_many_cached(
+                    [query, keyword_query]
+                )
+            else:
+                query_embedding = self._embed_cached(query)
+        if keywords_are_query:
+            keyword_embedding = query_embedding
+
+        # 1. Semantic search (submitted, not awaited yet)
+        semantic_future = _SEARCH_POOL.submit(
+            self.pinecone_service.search,
             query_vector=query_embedding,
             top_k=top_k * 2,  # Get more for deduplication
             filter_dict=filter_dict
         )
-        
+
+        # 2. Keyword search in the caller thread while the semantic query
+        # is in flight
+        if keywords:
+            if keyword_embedding is None:
+                keyword_embedding = self._embed_cached(keyword_query)
+            keyword_results = self._keyword_search(
+                keywords,
+                top_k=top_k,
+                filter_dict=filter_dict,
+                query_embedding=keyword_embedding
+            )
+        else:
+            keyword_results = []
+
+        semantic_results = semantic_future.result()
+
+        # Drop sub-threshold noise before it reaches the merge (and, on
+        # the reranking path, the Cohere payload)
+        semantic_results = [
+            result for result in semantic_results
+            if result.get('score', 0.0) >= SEMANTIC_MIN_SCORE
+        ]
+
         # Mark semantic results
         for result in semantic_results:
             result['search_method'] = 'semantic'
-        
-        # 2. Keyword search
-        keywords = self._extract_keywords(query)
-        keyword_results = self._keyword_search(keywords, top_k=top_k, filter_dict=filter_dict)
-        
+
         # Mark keyword results
         for result in keyword_results:
             result['search_method'] = 'keyword'
         
-        # 3. Combine and deduplicate by chunk ID
-        seen_ids: Set[str] = set()
-        combined_results = []
-        
-        # First add semantic results (prioritize semantic matches)
-        for result in semantic_results:
-            chunk_id = result.get('id', '')
-            if chunk_id not in seen_ids:
-                seen_ids.add(chunk_id)
-                combined_results.append(result)
-        
-        # Then add keyword results that weren't already included
-        for result in keyword_results:
+        # 3. Merge with Reciprocal Rank Fusion: each list contributes
+        # 1/(RRF_K + rank) per chunk, so ordering comes from ranks rather
+        # than from mixing non-comparable similarity and keyword-boost
+        # scores. A dict keyed by chunk id makes the dedup O(n); 'score'
+        # keeps the raw similarity for downstream relevance thresholds,
+        # with the fused value in 'rrf_score'.
+        by_id: Dict[str, Dict[str, Any]] = {}
+
+        for rank, result in enumerate(semantic_results, start=1):
+            result['rrf_score'] = 1.0 / (RRF_K + rank)
+            by_id[result.get('id', '')] = result
+
+        for rank, result in enumerate(keyword_results, start=1):
             chunk_id = result.get('id', '')
-            if chunk_id not in seen_ids:
-                seen_ids.add(chunk_id)
-                # If it appeared in both, mark as hybrid
-                result['search_method'] = 'hybrid'
-                combined_results.append(result)
+            existing = by_id.get(chunk_id)
+            if existing is None:
+                result['rrf_score'] = 1.0 / (RRF_K + rank)
+                by_id[chunk_id] = result
             else:
-                # Update existing result to hybrid if it was semantic
-                for existing in combined_results:
-                    if existing.get('id') == chunk_id:
-                        existing['search_method'] = 'hybrid'
-                        # Boost score if keyword matched
-                        if 'keyword_matches' in result:
-                            existing['score'] = max(
-                                existing.get('score', 0.0),
-                                result.get('score', 0.0)
-                            )
-                        # Add matched keywords if available
-                        if 'matched_keywords' in result:
-                            existing['matched_keywords'] = result.get('matched_keywords', [])
-        
-        # Sort by score and take top_k
-        combined_results.sort(key=lambda x: x.get('score', 0.0), reverse=True)
-        final_results = combined_results[:top_k]
-        
-        # Log search method breakdown
-        method_counts = {}
-        for result in final_results:
-            method = result.get('search_method', 'unknown')
-            method_counts[method] = method_counts.get(method, 0) + 1
-        
-        logger.info(
-            f"Hybrid search found {len(final_results)} results "
-            f"(semantic: {method_counts.get('semantic', 0)}, "
-            f"keyword: {method_counts.get('keyword', 0)}, "
-            f"hybrid: {method_counts.get('hybrid', 0)})"
+                # Present in both lists: fuse the contributions
+                existing['rrf_score'] += 1.0 / (RRF_K + rank)
+                existing['search_method'] = 'hybrid'
+                if 'keyword_matches' in result:
+                    existing['keyword_matches'] = result['keyword_matches']
+                if 'matched_keywords' in result:
+                    existing['matched_keywords'] = result['matched_keywords']
+
+        # Select the top_k by fused score (heap selection, no full sort)
+        final_results = heapq.nlargest(
+            top_k,
+            by_id.values(),
+            key=itemgetter('rrf_score')  # set on every entry in the merge
         )
         
+        # Log search method breakdown (built only when INFO is emitted -
+        # the counting pass and dict are wasted work otherwise)
+        if logger.isEnabledFor(logging.INFO):
+            method_counts = {}
+            for result in final_results:
+                method = result.get('search_method', 'unknown')
+                method_counts[method] = method_counts.get(method, 0) + 1
+
+            logger.info(
+                "Hybrid search found %d results (semantic: %d, keyword: %d, hybrid: %d)",
+                len(final_results),
+                method_counts.get('semantic', 0),
+                method_counts.get('keyword', 0),
+                method_counts.get('hybrid', 0)
+            )
+        
         return final_results
     
+    def search_many(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        max_workers: int = 8
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Retrieve chunks for multiple queries with batched embedding and
+        parallel Pinecone lookups.
+
+        All queries are embedded in one OpenAI batch call, then the
+        searches run on a thread pool - the GIL is released during the
+        network wait and the Pinecone client is thread-safe, so N lookups
+        cost roughly one round trip instead of N. Uses single-shot
+        semantic retrieval (no hybrid merge), like the batch endpoint.
+
+        Args:
+            queries: Queries to retrieve for
+            top_k: Number of results per query
+            filter_dict: Optional metadata filters applied to every query
+            max_workers: Maximum concurrent Pinecone lookups
+
+        Returns:
+            One result list per query, in input order
+        """
+        if not queries:
+            return []
+
+        logger.info(f"Batch retrieval for {len(queries)} queries (top_k={top_k})")
+
+        embeddings = self.embedding_service.generate_embeddings_batch(queries)
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(queries))) as executor:
+            all_results = list(executor.map(
+                lambda vec: self.pinecone_service.search(
+                    query_vector=vec,
+                    top_k=top_k,
+                    filter_dict=filter_dict
+                ),
+                embeddings
+            ))
+
+        for results in all_results:
+            for result in results:
+                result['search_method'] = 'semantic'
+
+        return all_results
+
+    @staticmethod
+    def _dedup_chunks(chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Drop chunks whose text duplicates an earlier chunk's.
+
+        Overlapping chunks of the same page can surface under different
+        ids; each duplicate costs full input-token price in the prompt and
+        clutters the sources list. Keyed on a hash of the text head (256
+        chars is past the chunk overlap), keeping first occurrence -
+        i.e. the better-ranked one. Runs after reranking so prompt order
+        is preserved.
+
+        Args:
+            chunks: Ranked chunks bound for the prompt and sources list
+
+        Returns:
+            Chunks with duplicate texts removed, order preserved
+        """
+        seen_hashes = set()
+        unique = []
+        for chunk in chunks:
+            metadata = chunk.get('metadata') or {}
+            text = metadata.get('text', chunk.get('text', ''))
+            key = hashlib.blake2b(text[:256].encode(), digest_size=8).digest()
+            if key in seen_hashes:
+                continue
+            seen_hashes.add(key)
+            unique.append(chunk)
+        if len(unique) < len(chunks):
+            logger.info("Dropped %d duplicate chunks before prompt build", len(chunks) - len(unique))
+        return unique
+
     def _rerank_results(
         self,
         query: str,
@@ -281,19 +873,33 @@ class RAGService:
             return results[:top_k]
         
         try:
-            # Prepare documents for reranking
+            # Prepare documents for reranking, deduplicated by content
+            # hash: hybrid retrieval can surface the same chunk text more
+            # than once, and Cohere bills and scans per document, so each
+            # unique text ships once and its score is broadcast back
             documents = []
+            doc_index_for_key: Dict[bytes, int] = {}
+            doc_index_by_result = []
             for result in results:
                 metadata = result.get('metadata', {})
                 text = metadata.get('text', '')
                 doc_name = metadata.get('document_name', 'Unknown')
                 page = metadata.get('page_number', 'N/A')
-                
+
                 # Format document for reranking
                 doc_text = f"[{doc_name}, Page {page}] {text[:500]}"
-                documents.append(doc_text)
-            
-            logger.info(f"Reranking {len(documents)} results with Cohere")
+                key = hashlib.blake2b(doc_text.encode(), digest_size=8).digest()
+                doc_index = doc_index_for_key.get(key)
+                if doc_index is None:
+                    doc_index = len(documents)
+                    doc_index_for_key[key] = doc_index
+                    documents.append(doc_text)
+                doc_index_by_result.append(doc_index)
+
+            logger.info(
+                "Reranking %d results (%d unique documents) with Cohere",
+                len(results), len(documents)
+            )
             
             # Call Cohere rerank API
             # Cohere rerank API expects query and documents list
@@ -305,35 +911,46 @@ class RAGService:
                 return_documents=False  # We'll keep our metadata
             )
             
+            # Invert the result -> unique-document mapping so each scored
+            # document can fan back out to every original that shares it
+            originals_for_doc: Dict[int, List[int]] = {}
+            for original_index, doc_index in enumerate(doc_index_by_result):
+                originals_for_doc.setdefault(doc_index, []).append(original_index)
+
             # Map reranked results back to original result structure
             reranked_results = []
             for result_item in rerank_response.results:
-                original_index = result_item.index
                 relevance_score = result_item.relevance_score
-                
-                # Get original result
-                original_result = results[original_index].copy()
-                
-                # Preserve original semantic score for filtering (semantic scores are typically 0.7-0.95)
-                # Cohere rerank scores are typically 0.0-0.5, so we keep semantic score for threshold checks
-                original_semantic_score = original_result.get('score', 0.0)
-                original_result['semantic_score'] = original_semantic_score  # Preserve original
-                original_result['rerank_score'] = relevance_score  # Store rerank score separately
-                
-                # Use rerank score for ordering (reranking improves relevance order)
-                # But keep semantic score as main score for filtering thresholds
-                original_result['score'] = original_semantic_score  # Keep semantic score for filtering
-                original_result['rerank_relevance'] = relevance_score  # Store rerank score for reference
-                
-                reranked_results.append(original_result)
-            
-            # Sort by rerank score (better ordering) but keep semantic scores for filtering
+
+                for original_index in originals_for_doc.get(result_item.index, []):
+                    # Get original result
+                    original_result = results[original_index].copy()
+
+                    # Preserve original semantic score for filtering (semantic scores are typically 0.7-0.95)
+                    # Cohere rerank scores are typically 0.0-0.5, so we keep semantic score for threshold checks
+                    original_semantic_score = original_result.get('score', 0.0)
+                    original_result['semantic_score'] = original_semantic_score  # Preserve original
+                    original_result['rerank_score'] = relevance_score  # Store rerank score separately
+
+                    # Use rerank score for ordering (reranking improves relevance order)
+                    # But keep semantic score as main score for filtering thresholds
+                    original_result['score'] = original_semantic_score  # Keep semantic score for filtering
+                    original_result['rerank_relevance'] = relevance_score  # Store rerank score for reference
+
+                    reranked_results.append(original_result)
+
+            # Sort by rerank score (better ordering) but keep semantic scores
+            # for filtering; broadcasting duplicates can push the list past
+            # top_k, so cut it back down
             reranked_results.sort(key=lambda x: x.get('rerank_relevance', 0.0), reverse=True)
+            reranked_results = reranked_results[:top_k]
             
-            logger.info(
-                f"Cohere reranking completed: "
-                f"top score={max(r['rerank_score'] for r in reranked_results):.3f}"
-            )
+            # Guarded: the max() scan is only worth running when emitted
+            if reranked_results and logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    "Cohere reranking completed: top score=%.3f",
+                    max(r['rerank_score'] for r in reranked_results)
+                )
             
             return reranked_results
             
@@ -342,104 +959,375 @@ class RAGService:
             # Fallback to original results
             return results[:top_k]
     
-    def generate_answer(
+    def _build_prompts(
         self,
         query: str,
         context_chunks: List[Dict[str, Any]],
-        max_tokens: int = 1000,
         query_analysis: Optional[Any] = None
-    ) -> Tuple[str, float]:
+    ) -> Tuple[str, str]:
         """
-        Generate answer using LLM with retrieved context
-        
+        Build the hardened (system, user) prompt pair from retrieved chunks.
+
+        Shared by the sync and async answer paths so the prompt structure
+        can never drift between them.
+
         Args:
             query: User's question
             context_chunks: Retrieved document chunks
-            max_tokens: Maximum tokens for response
-            
+            query_analysis: Optional QueryAnalysisResult to improve prompts
+
         Returns:
-            Tuple of (generated_answer, cost_usd)
+            Tuple of (system_prompt, user_prompt)
         """
-        if not context_chunks:
-            return "I couldn't find any relevant information in the documents to answer your question.", 0.0
-        
-        # Build context from retrieved chunks
-        context_parts = []
-        for i, chunk in enumerate(context_chunks, 1):
-            metadata = chunk.get('metadata', {})
-            doc_name = metadata.get('document_name', 'Unknown')
-            page = metadata.get('page_number', 'N/A')
-            text = metadata.get('text', chunk.get('text', ''))
-            
-            # Sanitize text before adding to context
-            sanitized_text = sanitize_for_prompt(text, max_length=1000)
-            
-            context_parts.append(
-                f"[Source {i}] Document: {doc_name}, Page: {page}\n"
-                f"{sanitized_text}\n"
-            )
-        
-        context = "\n".join(context_parts)
-        
-        # Hardened prompt structure to prevent injection
-        system_prompt_base = """You are an expert financial research assistant. Answer questions based ONLY on the provided document context. 
-Be precise and cite specific sources. If the context doesn't contain enough information, say so clearly.
+        context = self._build_context(context_chunks)
+
+        # Assemble the system prompt base from the module-level template
+        # pieces. The handful of distinct results (plain / multi-part by
+        # count / comparison) each hit the lru_cache inside harden_prompt,
+        # so the full hardened system prompt is built once per variant.
+        system_prompt_base = _SYSTEM_PROMPT_BASE
 
-Format your response professionally and include references to the source documents when making claims."""
-        
         # Enhance prompt for multi-part questions if detected
         if query_analysis and hasattr(query_analysis, 'is_multi_part') and query_analysis.is_multi_part:
-            system_prompt_base += f"""
+            system_prompt_base += _MULTI_PART_ADDENDUM.format(
+                count=query_analysis.question_count
+            )
 
-IMPORTANT: This query contains multiple parts ({query_analysis.question_count} parts detected). 
-- Address ALL aspects of the question comprehensively
-- Organize your response to clearly cover each part
-- Use clear structure (e.g., numbered points or sections) if multiple distinct questions are present
-- Ensure each part of the question receives adequate attention"""
-            
             if query_analysis.connectors and 'comparison' in query_analysis.connectors:
-                system_prompt_base += "\n- This appears to be a comparison question. Provide a clear side-by-side comparison with specific details from the documents."
-        
+                system_prompt_base += _COMPARISON_ADDENDUM
+
         # Use hardened prompt function
-        system_prompt, user_prompt = harden_prompt(query, context, system_prompt_base)
-        
-        logger.info(f"Generating answer with {len(context_chunks)} context chunks")
-        
-        try:
+        return harden_prompt(query, context, system_prompt_base)
+
+    def _build_context(self, context_chunks: List[Dict[str, Any]]) -> str:
+        """
+        Assemble the context block from retrieved chunks.
+
+        With a tokenizer available, chunks are packed greedily against a
+        global token budget: per-chunk char truncation sends ~1000 chars per
+        chunk regardless of top_k, which under-fills the prompt at top_k=5
+        and blows past the window (and the input-token bill) at top_k=20.
+        The last chunk that doesn't fit is truncated at the token boundary.
+        Without a tokenizer, the original per-chunk char cap applies.
+
+        Args:
+            context_chunks: Retrieved document chunks
+
+        Returns:
+            Formatted context string for the prompt
+        """
+        extracted = _extract(context_chunks)
+
+        if self._enc is None:
+            # Fallback: fixed char cap per chunk (original behavior)
+            return "\n".join(
+                f"[Source {i}] Document: {metadata.get('document_name', 'Unknown')}, "
+                f"Page: {metadata.get('page_number', 'N/A')}\n"
+                f"{sanitize_for_prompt(metadata.get('text', chunk.get('text', '')), max_length=1000)}\n"
+                for i, (metadata, chunk) in enumerate(extracted, 1)
+            )
+
+        budget = self.context_token_budget
+        tokens_used = 0
+        parts = []
+
+        for i, (metadata, chunk) in enumerate(extracted, 1):
+            remaining = budget - tokens_used
+            if remaining <= 0:
+                logger.info(f"Context token budget spent after {i - 1} of {len(context_chunks)} chunks")
+                break
+
+            # Sanitize with a generous cap; the token budget does the real
+            # limiting (4000 chars comfortably exceeds 1000 tokens)
+            text = sanitize_for_prompt(
+                metadata.get('text', chunk.get('text', '')), max_length=4000
+            )
+
+            tokens = self._enc.encode(text)
+            if len(tokens) > remaining:
+                text = self._enc.decode(tokens[:remaining])
+                tokens_used = budget
+            else:
+                tokens_used += len(tokens)
+
+            parts.append(
+                f"[Source {i}] Document: {metadata.get('document_name', 'Unknown')}, "
+                f"Page: {metadata.get('page_number', 'N/A')}\n{text}\n"
+            )
+
+        return "\n".join(parts)
+
+    def _finalize_completion(self, response: Any) -> Tuple[str, float]:
+        """
+        Extract the answer text and compute the LLM cost from a completion.
+
+        Args:
+            response: Chat completion response from the OpenAI SDK
+
+        Returns:
+            Tuple of (generated_answer, cost_usd)
+        """
+        answer = response.choices[0].message.content.strip()
+
+        # Calculate actual cost from usage
+        usage = response.usage
+        input_tokens = usage.prompt_tokens if usage else 0
+        output_tokens = usage.completion_tokens if usage else 0
+
+        # Cost from the per-token pricing resolved at init (integer
+        # microdollars; converted to float only for the return value)
+        llm_micro = input_tokens * self._input_micro + output_tokens * self._output_micro
+        llm_cost = llm_micro / MICRO_PER_USD
+
+        logger.info(
+            f"Generated answer ({len(answer)} characters, "
+            f"{input_tokens} input tokens, {output_tokens} output tokens, "
+            f"cost: ${llm_cost:.4f})"
+        )
+
+        return answer, llm_cost
+
+    def generate_answer(
+        self,
+        query: str,
+        context_chunks: List[Dict[str, Any]],
+        max_tokens: int = 1000,
+        query_analysis: Optional[Any] = None
+    ) -> Tuple[str, float]:
+        """
+        Generate answer using LLM with retrieved context
+
+        Args:
+            query: User's question
+            context_chunks: Retrieved document chunks
+            max_tokens: Maximum tokens for response
+
+        Returns:
+            Tuple of (generated_answer, cost_usd)
+        """
+        if not context_chunks:
+            return "I couldn't find any relevant information in the documents to answer your question.", 0.0
+
+        system_prompt, user_prompt = self._build_prompts(query, context_chunks, query_analysis)
+
+        logger.info(f"Generating answer with {len(context_chunks)} context chunks")
+
+        try:
             response = self.llm_client.chat.completions.create(
                 model=self.llm_model,
                 messages=[
-                    {"role": "system", "content": system_prompt},
+                    _system_message(system_prompt),
                     {"role": "user", "content": user_prompt}
                 ],
                 max_tokens=max_tokens,
                 temperature=0.3  # Lower temperature for more factual responses
             )
-            
-            answer = response.choices[0].message.content.strip()
-            
-            # Calculate actual cost from usage
-            usage = response.usage
-            input_tokens = usage.prompt_tokens if usage else 0
-            output_tokens = usage.completion_tokens if usage else 0
-            
-            # Cost calculation (GPT-4-turbo pricing)
-            input_cost = (input_tokens / 1000) * 0.01  # $0.01 per 1K input tokens
-            output_cost = (output_tokens / 1000) * 0.03  # $0.03 per 1K output tokens
-            llm_cost = input_cost + output_cost
-            
-            logger.info(
-                f"Generated answer ({len(answer)} characters, "
-                f"{input_tokens} input tokens, {output_tokens} output tokens, "
-                f"cost: ${llm_cost:.4f})"
+            return self._finalize_completion(response)
+
+        except Exception as e:
+            logger.error(f"Error generating answer: {str(e)}")
+            raise
+
+    async def agenerate_answer(
+        self,
+        query: str,
+        context_chunks: List[Dict[str, Any]],
+        max_tokens: int = 1000,
+        query_analysis: Optional[Any] = None
+    ) -> Tuple[str, float]:
+        """
+        Async variant of generate_answer for the aquery path
+
+        Args:
+            query: User's question
+            context_chunks: Retrieved document chunks
+            max_tokens: Maximum tokens for response
+            query_analysis: Optional QueryAnalysisResult to improve prompts
+
+        Returns:
+            Tuple of (generated_answer, cost_usd)
+        """
+        if not context_chunks:
+            return "I couldn't find any relevant information in the documents to answer your question.", 0.0
+
+        system_prompt, user_prompt = self._build_prompts(query, context_chunks, query_analysis)
+
+        logger.info(f"Generating answer with {len(context_chunks)} context chunks")
+
+        try:
+            response = await self.allm_client.chat.completions.create(
+                model=self.llm_model,
+                messages=[
+                    _system_message(system_prompt),
+                    {"role": "user", "content": user_prompt}
+                ],
+                max_tokens=max_tokens,
+                temperature=0.3  # Lower temperature for more factual responses
             )
-            
-            return answer, llm_cost
-            
+            return self._finalize_completion(response)
+
         except Exception as e:
             logger.error(f"Error generating answer: {str(e)}")
             raise
-    
+
+    def generate_answer_stream(
+        self,
+        query: str,
+        context_chunks: List[Dict[str, Any]],
+        max_tokens: int = 1000,
+        query_analysis: Optional[Any] = None,
+        usage_out: Optional[Dict[str, int]] = None
+    ) -> Iterator[str]:
+        """
+        Stream the answer token-by-token instead of blocking on the full
+        completion.
+
+        Time-to-first-token is a few hundred ms while the full completion
+        takes seconds, so streaming is a large perceived-latency win on
+        the same byte count.
+
+        Args:
+            query: User's question
+            context_chunks: Retrieved document chunks
+            max_tokens: Maximum tokens for response
+            query_analysis: Optional QueryAnalysisResult to improve prompts
+            usage_out: Optional dict populated with prompt_tokens and
+                completion_tokens once the stream finishes, so the caller
+                can still compute the LLM cost
+
+        Yields:
+            Answer text fragments in generation order
+        """
+        if not context_chunks:
+            yield "I couldn't find any relevant information in the documents to answer your question."
+            return
+
+        system_prompt, user_prompt = self._build_prompts(query, context_chunks, query_analysis)
+
+        logger.info(f"Streaming answer with {len(context_chunks)} context chunks")
+
+        try:
+            response = self.llm_client.chat.completions.create(
+                model=self.llm_model,
+                messages=[
+                    _system_message(system_prompt),
+                    {"role": "user", "content": user_prompt}
+                ],
+                max_tokens=max_tokens,
+                temperature=0.3,  # Lower temperature for more factual responses
+                stream=True,
+                # The final stream chunk carries token usage for costing
+                stream_options={"include_usage": True}
+            )
+
+            for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+                if usage_out is not None and getattr(chunk, 'usage', None):
+                    usage_out['prompt_tokens'] = chunk.usage.prompt_tokens
+                    usage_out['completion_tokens'] = chunk.usage.completion_tokens
+
+        except Exception as e:
+            logger.error(f"Error streaming answer: {str(e)}")
+            raise
+
+    def query_stream(
+        self,
+        query: str,
+        top_k: int = 5,
+        use_reranking: bool = False,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        query_analysis: Optional[Any] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming RAG pipeline: yields sources first, then answer tokens.
+
+        Event shapes:
+            {'type': 'sources', 'data': [...]}   - retrieved citations (first)
+            {'type': 'token',   'data': '...'}   - answer text fragment
+            {'type': 'done',    'data': {...}}   - full result dict, same
+                                                   shape as query() returns
+
+        The sources are already computed before the LLM call starts, so the
+        frontend can render citations immediately. Tokens are accumulated
+        into the final result, which is cached exactly like query()'s.
+
+        Args:
+            query: User's question
+            top_k: Number of chunks to retrieve
+            use_reranking: Whether to use reranking
+            filter_dict: Optional metadata filters
+            query_analysis: Optional QueryAnalysisResult to improve prompts
+
+        Yields:
+            Event dicts as described above
+        """
+        # Cache hits stream back in two events: the cached answer arrives
+        # as a single token fragment
+        cache_key = None
+        cache_params = None
+        if settings.ENABLE_LLM_CACHE:
+            cache_key = self._answer_cache_key(query, top_k, use_reranking, filter_dict)
+            cached = self._cached_answer(cache_key)
+            if cached is not None:
+                logger.info(f"Answer cache hit for query: {query[:100]}")
+                yield {'type': 'sources', 'data': cached['sources']}
+                yield {'type': 'token', 'data': cached['answer']}
+                yield {'type': 'done', 'data': {**cached, 'cost_usd': 0.0, 'cache_hit': True}}
+                return
+            cache_params = self._cache_params(top_k, use_reranking, filter_dict)
+
+        query_embedding = self._embed_cached(query)
+
+        if cache_params is not None:
+            cached = self._semantic_cache.get_semantic(query_embedding, cache_params)
+            if cached is not None:
+                logger.info(f"Semantic answer cache hit for query: {query[:100]}")
+                yield {'type': 'sources', 'data': cached['sources']}
+                yield {'type': 'token', 'data': cached['answer']}
+                yield {'type': 'done', 'data': {**cached, 'cost_usd': 0.0, 'cache_hit': True}}
+                return
+
+        # Retrieval, identical to query()
+        initial_top_k = top_k * self.rerank_multiplier if use_reranking else top_k
+        chunks = self.search(
+            query,
+            top_k=initial_top_k,
+            filter_dict=filter_dict,
+            use_hybrid=True,
+            query_embedding=query_embedding
+        )
+        if use_reranking and chunks:
+            chunks = self._rerank_results(query, chunks, top_k=top_k)
+            logger.info(f"Reranked {len(chunks)} results using Cohere")
+        chunks = self._dedup_chunks(chunks)
+
+        # Sources are ready before the LLM call - send them immediately
+        yield {'type': 'sources', 'data': self._format_sources(chunks)}
+
+        # Stream tokens, accumulating them so the final answer can be
+        # cached and costed like the non-streaming path
+        usage: Dict[str, int] = {}
+        answer_parts: List[str] = []
+        for token in self.generate_answer_stream(
+            query, chunks, query_analysis=query_analysis, usage_out=usage
+        ):
+            answer_parts.append(token)
+            yield {'type': 'token', 'data': token}
+
+        answer = "".join(answer_parts).strip()
+        llm_cost = (
+            usage.get('prompt_tokens', 0) * self._input_micro
+            + usage.get('completion_tokens', 0) * self._output_micro
+        ) / MICRO_PER_USD
+
+        result = self._assemble_result(query, chunks, answer, llm_cost, top_k, use_reranking)
+
+        if cache_key is not None:
+            self._store_answer(cache_key, cache_params, query, query_embedding, result)
+
+        yield {'type': 'done', 'data': result}
+
     def query(
         self,
         query: str,
@@ -461,42 +1349,159 @@ IMPORTANT: This query contains multiple parts ({query_analysis.question_count} p
         Returns:
             Dict with answer, sources, and query
         """
-        # Step 1: Retrieve relevant chunks using hybrid search
-        # If reranking is enabled, retrieve more chunks initially
-        initial_top_k = top_k * 2 if use_reranking else top_k
-        chunks = self.search(query, top_k=initial_top_k, filter_dict=filter_dict, use_hybrid=True)
-        
-        # Step 2: Apply reranking if enabled
-        if use_reranking and chunks:
-            chunks = self._rerank_results(query, chunks, top_k=top_k)
-            logger.info(f"Reranked {len(chunks)} results using Cohere")
-        
-        # Step 3: Generate answer with context (returns answer and cost)
-        # Pass query_analysis to improve prompts for multi-part questions
-        answer, llm_cost = self.generate_answer(query, chunks, query_analysis=query_analysis)
-        
-        # Step 4: Estimate embedding cost
-        query_length = len(query.split())
-        embedding_tokens = query_length * 1.3  # Approximation
-        embedding_cost = (embedding_tokens / 1000) * 0.00013  # text-embedding-3-large
-        
-        # Step 5: Estimate Pinecone cost (rough estimate)
-        pinecone_cost = top_k * 0.0001
-        
-        # Step 6: Estimate Cohere reranking cost if used
-        rerank_cost = 0.0
+        # Step 0a: Exact cache - identical requests skip the entire
+        # pipeline (embedding + Pinecone + LLM round trips)
+        cache_key = None
+        cache_params = None
+        if settings.ENABLE_LLM_CACHE:
+            cache_key = self._answer_cache_key(query, top_k, use_reranking, filter_dict)
+            cached = self._cached_answer(cache_key)
+            if cached is not None:
+                logger.info(f"Answer cache hit for query: {query[:100]}")
+                # No API calls were made, so the hit costs nothing
+                return {**cached, 'cost_usd': 0.0, 'cache_hit': True}
+            cache_params = self._cache_params(top_k, use_reranking, filter_dict)
+
+        # Step 0b: Singleflight - if an identical request is already in
+        # flight on another thread, wait for the leader and serve its
+        # freshly cached result. A 10-request burst of the same question
+        # fires one LLM call instead of ten.
+        leader = False
+        if cache_key is not None:
+            leader, event = self._inflight_acquire(cache_key)
+            if not leader:
+                if event.wait(timeout=INFLIGHT_WAIT_SECONDS):
+                    cached = self._cached_answer(cache_key)
+                    if cached is not None:
+                        logger.info(f"Coalesced duplicate in-flight query: {query[:100]}")
+                        return {**cached, 'cost_usd': 0.0, 'cache_hit': True}
+                # Leader failed or timed out without caching - compute
+                logger.warning("In-flight leader produced no result; recomputing")
+
+        try:
+            # The embedding is needed for retrieval regardless, so compute it
+            # once here and share it between the semantic cache probe and search
+            query_embedding = self._embed_cached(query)
+
+            # Step 0c: Semantic cache - paraphrases of a recently answered
+            # question skip Pinecone and the LLM (only the embedding was paid)
+            if cache_params is not None:
+                cached = self._semantic_cache.get_semantic(query_embedding, cache_params)
+                if cached is not None:
+                    logger.info(f"Semantic answer cache hit for query: {query[:100]}")
+                    return {**cached, 'cost_usd': 0.0, 'cache_hit': True}
+
+            # Step 1: Retrieve relevant chunks using hybrid search
+            # If reranking is enabled, retrieve more chunks initially
+            initial_top_k = top_k * self.rerank_multiplier if use_reranking else top_k
+            chunks = self.search(
+                query,
+                top_k=initial_top_k,
+                filter_dict=filter_dict,
+                use_hybrid=True,
+                query_embedding=query_embedding
+            )
+
+            # Step 2: Apply reranking if enabled
+            if use_reranking and chunks:
+                chunks = self._rerank_results(query, chunks, top_k=top_k)
+                logger.info(f"Reranked {len(chunks)} results using Cohere")
+
+            # Don't pay prompt tokens for duplicated chunk text
+            chunks = self._dedup_chunks(chunks)
+
+            # Step 3: Generate answer with context (returns answer and cost)
+            # Pass query_analysis to improve prompts for multi-part questions
+            answer, llm_cost = self.generate_answer(query, chunks, query_analysis=query_analysis)
+
+            result = self._assemble_result(query, chunks, answer, llm_cost, top_k, use_reranking)
+
+            # Store for future identical requests (LRU-bounded) and for
+            # near-duplicate phrasings via the semantic layer. This runs
+            # before followers are woken, so they always find the result.
+            if cache_key is not None:
+                self._store_answer(cache_key, cache_params, query, query_embedding, result)
+
+            return result
+        finally:
+            if leader:
+                self._inflight_release(cache_key)
+
+    def _assemble_result(
+        self,
+        query: str,
+        chunks: List[Dict[str, Any]],
+        answer: str,
+        llm_cost: float,
+        top_k: int,
+        use_reranking: bool
+    ) -> Dict[str, Any]:
+        """
+        Build the final response dict: cost estimates plus formatted sources.
+
+        Shared by query() and aquery() so the response shape stays identical.
+
+        Args:
+            query: User's question
+            chunks: Retrieved (and possibly reranked) chunks
+            answer: Generated answer text
+            llm_cost: Actual LLM cost from token usage
+            top_k: Number of chunks requested
+            use_reranking: Whether reranking was requested
+
+        Returns:
+            Dict with answer, sources, query, and cost fields
+        """
+        # Cost estimates in integer microdollars. The embedding token count
+        # uses byte length (~4 bytes/token) rather than whitespace splitting,
+        # which undercounts CJK and other unspaced scripts by 2-10x.
+        embedding_tokens = len(query.encode()) // 4 + 1
+        embedding_micro = embedding_tokens * EMBEDDING_MICRO_PER_100_TOKENS // 100
+
+        pinecone_micro = top_k * PINECONE_MICRO_PER_RESULT
+
+        # One rerank call = one billed request
+        rerank_micro = 0
         if use_reranking and self.cohere_client:
-            # Cohere rerank pricing: $1.00 per 1,000 requests (as of 2024)
-            # Each rerank operation counts as 1 request
-            rerank_cost = 0.001  # $0.001 per rerank operation
-        
-        # Total cost
-        total_cost = embedding_cost + llm_cost + pinecone_cost + rerank_cost
-        
-        # Step 7: Format sources with search method metadata
+            rerank_micro = RERANK_MICRO_PER_CALL
+
+        # llm_cost comes in as micro/1e6 from the completion paths; recover
+        # the exact integer so the total is a single int sum
+        llm_micro = round(llm_cost * MICRO_PER_USD)
+        total_cost = (embedding_micro + llm_micro + pinecone_micro + rerank_micro) / MICRO_PER_USD
+
+        cost_breakdown = {
+            'embedding': embedding_micro / MICRO_PER_USD,
+            'llm': llm_cost,
+            'pinecone': pinecone_micro / MICRO_PER_USD
+        }
+        if rerank_micro > 0:
+            cost_breakdown['rerank'] = rerank_micro / MICRO_PER_USD
+
+        sources = self._format_sources(chunks)
+
+        return {
+            'answer': answer,
+            'sources': sources,
+            'query': query,
+            'cost_usd': total_cost,
+            'cost_breakdown': cost_breakdown,
+            'reranked': use_reranking and self.cohere_client is not None
+        }
+
+    @staticmethod
+    def _format_sources(chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Format retrieved chunks into source citations for the response.
+
+        Args:
+            chunks: Retrieved (and possibly reranked) chunks
+
+        Returns:
+            List of source dicts with search method metadata
+        """
         sources = []
-        for chunk in chunks:
-            metadata = chunk.get('metadata', {})
+        for metadata, chunk in _extract(chunks):
             search_method = chunk.get('search_method', 'semantic')
             
             # Use semantic score for filtering (preserved even after reranking)
@@ -513,23 +1518,278 @@ IMPORTANT: This query contains multiple parts ({query_analysis.question_count} p
                 'matched_keywords': chunk.get('matched_keywords', []) if chunk.get('matched_keywords') else None,
                 'rerank_score': rerank_score  # Cohere rerank score if available (for reference)
             })
-        
-        cost_breakdown = {
-            'embedding': embedding_cost,
-            'llm': llm_cost,
-            'pinecone': pinecone_cost
-        }
-        if rerank_cost > 0:
-            cost_breakdown['rerank'] = rerank_cost
-        
-        return {
-            'answer': answer,
-            'sources': sources,
-            'query': query,
-            'cost_usd': total_cost,
-            'cost_breakdown': cost_breakdown,
-            'reranked': use_reranking and self.cohere_client is not None
-        }
+
+        return sources
+
+    def _inflight_acquire(self, cache_key: str) -> Tuple[bool, threading.Event]:
+        """
+        Register as leader for cache_key, or join an existing leader.
+
+        Returns:
+            (True, event) if this caller should run the pipeline, or
+            (False, event) where event signals the leader's completion
+        """
+        with self._inflight_lock:
+            event = self._inflight.get(cache_key)
+            if event is None:
+                event = threading.Event()
+                self._inflight[cache_key] = event
+                return True, event
+            return False, event
+
+    def _inflight_release(self, cache_key: str):
+        """Wake followers and clear the in-flight marker for cache_key"""
+        with self._inflight_lock:
+            event = self._inflight.pop(cache_key, None)
+        if event is not None:
+            event.set()
+
+    def _cached_answer(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached answer: in-process layer first, then Redis.
+
+        A Redis hit is promoted into the local OrderedDict so repeat
+        traffic on this worker goes back to being a dict lookup.
+
+        Args:
+            cache_key: Key from _answer_cache_key()
+
+        Returns:
+            The cached result dict, or None on a miss in both layers
+        """
+        with self._answer_cache_lock:
+            cached = self._answer_cache.get(cache_key)
+            if cached is not None:
+                self._answer_cache.move_to_end(cache_key)
+                return cached
+
+        if _answer_redis is None:
+            return None
+        try:
+            payload = _answer_redis.get(_ANSWER_REDIS_PREFIX + cache_key)
+        except Exception as e:
+            logger.warning(f"Redis answer cache read failed: {e}")
+            return None
+        if payload is None:
+            return None
+        try:
+            result = json.loads(payload)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Discarding unparseable Redis answer cache entry: {e}")
+            return None
+
+        with self._answer_cache_lock:
+            self._answer_cache[cache_key] = result
+            self._answer_cache.move_to_end(cache_key)
+            while len(self._answer_cache) > ANSWER_CACHE_MAXSIZE:
+                self._answer_cache.popitem(last=False)
+        return result
+
+    def _store_answer(
+        self,
+        cache_key: str,
+        cache_params: Tuple,
+        query: str,
+        query_embedding: List[float],
+        result: Dict[str, Any]
+    ):
+        """Store a result in both answer cache layers (LRU-bounded exact
+        layer plus the embedding-similarity layer for paraphrases), with
+        a write-through to Redis when configured so other workers see it"""
+        with self._answer_cache_lock:
+            self._answer_cache[cache_key] = result
+            self._answer_cache.move_to_end(cache_key)
+            while len(self._answer_cache) > ANSWER_CACHE_MAXSIZE:
+                self._answer_cache.popitem(last=False)
+        self._semantic_cache.put(query, query_embedding, result, cache_params)
+
+        if _answer_redis is not None:
+            try:
+                _answer_redis.set(
+                    _ANSWER_REDIS_PREFIX + cache_key,
+                    json.dumps(result),
+                    ex=ANSWER_CACHE_REDIS_TTL
+                )
+            except Exception as e:
+                logger.warning(f"Redis answer cache write failed: {e}")
+
+    async def aquery(
+        self,
+        query: str,
+        top_k: int = 5,
+        use_reranking: bool = False,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        query_analysis: Optional[Any] = None
+    ) -> Dict[str, Any]:
+        """
+        Async RAG pipeline: same behavior as query() without blocking the
+        event loop on the OpenAI round trips.
+
+        The LLM and embedding calls use the async OpenAI client directly;
+        the Pinecone search and Cohere rerank (sync SDKs) are offloaded to
+        worker threads. Both cache layers apply exactly as in query().
+
+        Args:
+            query: User's question
+            top_k: Number of chunks to retrieve
+            use_reranking: Whether to use reranking
+            filter_dict: Optional metadata filters
+            query_analysis: Optional QueryAnalysisResult to improve prompts
+
+        Returns:
+            Dict with answer, sources, and query
+        """
+        # Exact cache check
+        cache_key = None
+        cache_params = None
+        if settings.ENABLE_LLM_CACHE:
+            cache_key = self._answer_cache_key(query, top_k, use_reranking, filter_dict)
+            cached = self._cached_answer(cache_key)
+            if cached is not None:
+                logger.info(f"Answer cache hit for query: {query[:100]}")
+                return {**cached, 'cost_usd': 0.0, 'cache_hit': True}
+            cache_params = self._cache_params(top_k, use_reranking, filter_dict)
+
+        # Singleflight: coalesce with an identical request already in
+        # flight on this event loop (asyncio.Event; no lock needed since
+        # the dict operations happen without an intervening await)
+        leader = False
+        if cache_key is not None:
+            event = self._ainflight.get(cache_key)
+            if event is None:
+                event = asyncio.Event()
+                self._ainflight[cache_key] = event
+                leader = True
+            else:
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=INFLIGHT_WAIT_SECONDS)
+                    cached = self._cached_answer(cache_key)
+                    if cached is not None:
+                        logger.info(f"Coalesced duplicate in-flight query: {query[:100]}")
+                        return {**cached, 'cost_usd': 0.0, 'cache_hit': True}
+                except asyncio.TimeoutError:
+                    pass
+                # Leader failed or timed out without caching - compute
+                logger.warning("In-flight leader produced no result; recomputing")
+
+        try:
+            query_embedding = await self._aembed_cached(query)
+
+            # Semantic cache check
+            if cache_params is not None:
+                cached = self._semantic_cache.get_semantic(query_embedding, cache_params)
+                if cached is not None:
+                    logger.info(f"Semantic answer cache hit for query: {query[:100]}")
+                    return {**cached, 'cost_usd': 0.0, 'cache_hit': True}
+
+            # Retrieval (sync Pinecone SDK -> worker thread)
+            initial_top_k = top_k * self.rerank_multiplier if use_reranking else top_k
+            chunks = await asyncio.to_thread(
+                self.search,
+                query,
+                top_k=initial_top_k,
+                filter_dict=filter_dict,
+                use_hybrid=True,
+                query_embedding=query_embedding
+            )
+
+            if use_reranking and chunks:
+                chunks = await asyncio.to_thread(self._rerank_results, query, chunks, top_k)
+                logger.info(f"Reranked {len(chunks)} results using Cohere")
+
+            # Don't pay prompt tokens for duplicated chunk text
+            chunks = self._dedup_chunks(chunks)
+
+            answer, llm_cost = await self.agenerate_answer(query, chunks, query_analysis=query_analysis)
+
+            result = self._assemble_result(query, chunks, answer, llm_cost, top_k, use_reranking)
+
+            # Cached before followers wake, so they always find the result
+            if cache_key is not None:
+                self._store_answer(cache_key, cache_params, query, query_embedding, result)
+
+            return result
+        finally:
+            if leader:
+                event = self._ainflight.pop(cache_key, None)
+                if event is not None:
+                    event.set()
+
+    async def aquery_batch(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        use_reranking: bool = False,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        max_concurrency: int = 8
+    ) -> List[Dict[str, Any]]:
+        """
+        Answer multiple queries concurrently through the full pipeline.
+
+        Each query runs the aquery() path (caches included); the semaphore
+        bounds in-flight pipelines so a large batch cannot exhaust the
+        connection pools or trip API rate limits. For N queries this costs
+        roughly one pipeline's wall-clock time instead of N.
+
+        Args:
+            queries: Queries to answer
+            top_k: Number of chunks to retrieve per query
+            use_reranking: Whether to use reranking
+            filter_dict: Optional metadata filters applied to every query
+            max_concurrency: Maximum number of in-flight pipelines
+
+        Returns:
+            List of result dicts in the same order as the input queries
+        """
+        if not queries:
+            return []
+
+        logger.info(f"Answering batch of {len(queries)} queries (max_concurrency={max_concurrency})")
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def bounded(query: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.aquery(
+                    query,
+                    top_k=top_k,
+                    use_reranking=use_reranking,
+                    filter_dict=filter_dict
+                )
+
+        return await asyncio.gather(*(bounded(query) for query in queries))
+
+    async def _aembed_cached(self, text: str) -> List[float]:
+        """
+        Async variant of _embed_cached sharing the same cache.
+
+        Args:
+            text: Text to embed
+
+        Returns:
+            Embedding vector for the text
+        """
+        key = hashlib.blake2b(
+            f"{self.embedding_service.model}|{text}".encode(),
+            digest_size=16
+        ).hexdigest()
+
+        with self._embedding_cache_lock:
+            embedding = self._embedding_cache.get(key)
+            if embedding is not None:
+                self._embedding_cache.move_to_end(key)
+                logger.debug("Embedding cache hit")
+                return embedding
+
+        embedding = await self.embedding_service.agenerate_embedding(text)
+
+        with self._embedding_cache_lock:
+            self._embedding_cache[key] = embedding
+            self._embedding_cache.move_to_end(key)
+            while len(self._embedding_cache) > EMBEDDING_CACHE_MAXSIZE:
+                self._embedding_cache.popitem(last=False)
+
+        return embedding
 
 
 # Example usage
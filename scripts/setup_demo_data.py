@@ -12,6 +12,7 @@ Usage:
     # Option 2: Use venv Python directly
     backend/venv/bin/python scripts/setup_demo_data.py
 """
+import asyncio
 import sys
 import logging
 from pathlib import Path
@@ -48,6 +49,7 @@ else:
 # Add backend to path so we can import services
 sys.path.insert(0, str(backend_dir))
 
+from core.config import settings
 from services.document_service import DocumentService
 from services.embedding_service import EmbeddingService
 from services.pinecone_service import PineconeService
@@ -103,55 +105,45 @@ def main():
     print()
     
     # Process each document
-    all_vectors = []
-    
+    all_chunks = []
+
     for pdf_file in pdf_files:
         try:
             print(f"Processing: {pdf_file.name}")
             print("-" * 60)
-            
+
             # Step 1: Load and chunk document
             logger.info(f"Step 1: Loading and chunking {pdf_file.name}")
             chunks = doc_service.process_document(str(pdf_file))
             print(f"✅ Created {len(chunks)} chunks")
-            
-            # Step 2: Generate embeddings
-            logger.info(f"Step 2: Generating embeddings for {len(chunks)} chunks")
-            chunk_texts = [chunk.text for chunk in chunks]
-            embeddings = embedding_service.generate_embeddings_batch(chunk_texts)
-            print(f"✅ Generated {len(embeddings)} embeddings")
-            
-            # Step 3: Prepare vectors for Pinecone
-            logger.info("Step 3: Preparing vectors for upload")
-            for chunk, embedding in zip(chunks, embeddings):
-                vector = {
-                    'id': chunk.chunk_id,
-                    'values': embedding,
-                    'metadata': {
-                        **chunk.metadata,
-                        'text': chunk.text[:1000]  # Store first 1000 chars in metadata
-                    }
-                }
-                all_vectors.append(vector)
-            
-            print(f"✅ Prepared {len(chunks)} vectors")
+            all_chunks.extend(chunks)
             print()
-            
+
         except Exception as e:
             logger.error(f"Error processing {pdf_file.name}: {str(e)}")
             print(f"❌ Error: {str(e)}")
             print()
             continue
-    
-    # Upload all vectors to Pinecone
-    if all_vectors:
+
+    # Step 2: Embed and upload in one pipeline - as each embedding batch
+    # returns from OpenAI, it is upserted to Pinecone while the next batch
+    # is already in flight
+    if all_chunks:
         print("=" * 60)
-        print(f"Uploading {len(all_vectors)} vectors to Pinecone...")
+        print(f"Embedding and uploading {len(all_chunks)} chunks to Pinecone...")
         print("-" * 60)
-        
+
         try:
-            pinecone_service.upsert_vectors(all_vectors, batch_size=100)
-            print(f"✅ Successfully uploaded all vectors!")
+            # Batch size comes from EMBEDDING_BATCH_SIZE so large corpora
+            # can push toward the API's 2048-input limit without code edits
+            total = asyncio.run(
+                embedding_service.aembed_and_upsert_chunks(
+                    all_chunks,
+                    pinecone_service,
+                    batch_size=settings.EMBEDDING_BATCH_SIZE
+                )
+            )
+            print(f"✅ Successfully uploaded {total} vectors!")
             print()
             
             # Get and display stats